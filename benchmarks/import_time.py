@@ -0,0 +1,71 @@
+"""Cold start benchmark for the DAMN CLI.
+
+Runs `import damn_tool` and `damn --help` in fresh interpreters and fails when
+the median wall time goes over budget, or when a connector client library gets
+imported before a connector is actually used.
+
+    python benchmarks/import_time.py --budget-ms 250
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Client libraries that should only be imported once their adapter is selected
+DEFERRED_MODULES = ['boto3', 'botocore', 'snowflake.connector', 'requests', 'jinja2', 'pyperclip', 'http.server', 'urllib.request']
+
+SCENARIOS = {
+    'import': "import damn_tool",
+    'help': "from damn_tool import cli; cli(['--help'], standalone_mode=False)",
+}
+
+
+def time_scenario(code, runs):
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+def find_loaded_modules(code):
+    check = f"{code}\nimport sys\nprint('loaded:' + ','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', check], check=True, capture_output=True, text=True)
+    loaded = result.stdout.strip().splitlines()[-1][len('loaded:'):]
+
+    return [m for m in loaded.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=250, help='Maximum median wall time per scenario')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts per scenario')
+    args = parser.parse_args()
+
+    # Baseline interpreter startup, so the budget only covers DAMN itself
+    baseline = time_scenario("pass", args.runs)
+    failed = False
+
+    for name, code in SCENARIOS.items():
+        elapsed = time_scenario(code, args.runs) - baseline
+        loaded = find_loaded_modules(code)
+
+        status = 'ok'
+        if elapsed > args.budget_ms:
+            status = f'over budget ({args.budget_ms:.0f} ms)'
+            failed = True
+        if loaded:
+            status = f'imported {", ".join(loaded)}'
+            failed = True
+
+        print(f"{name:<8} {elapsed:8.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Offline scaling benchmark for the DAMN commands.
+
+Runs `ls`, `show` and `metrics` against local stand-ins for Dagster, S3 and
+Snowflake (see stubs.py), over synthetic catalogs of increasing size, and reports
+per-command latency, round trips to each service and peak memory.
+
+    python benchmarks/scaling.py --sizes 100,1000,10000 --latency-ms 20
+    python benchmarks/scaling.py --save baseline.json
+    python benchmarks/scaling.py --compare baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep the caches and indexes built by the benchmark away from the user's ~/.damn
+os.environ['HOME'] = tempfile.mkdtemp(prefix='damn-bench-')
+os.environ['DAMN_NO_DAEMON'] = '1'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from damn_tool.ls import list_assets_data  # noqa: E402
+from damn_tool.metrics import asset_metrics_data, assets_metrics_data  # noqa: E402
+from damn_tool.show import show_asset_data, show_assets_data  # noqa: E402
+from damn_tool.utils.adapters.registry import register_adapter  # noqa: E402
+import stubs  # noqa: E402
+
+CONFIG_TEMPLATE = """orchestrator:
+  bench:
+    type: dagster
+    endpoint: {endpoint}
+    api_token: bench
+io-manager:
+  bench:
+    type: bench-s3
+    credentials: {{}}
+    bucket_name: bench
+    key_prefix: assets
+{catalog}
+data-warehouse:
+  bench:
+    type: bench-snowflake
+    database: BENCH
+{catalog}
+"""
+
+SCENARIOS = {
+    'ls': lambda context: list_assets_data(**context['kwargs']),
+    'show': lambda context: show_asset_data(context['asset'], **context['kwargs']),
+    'show --prefix': lambda context: show_assets_data(prefix=context['prefix'], **context['kwargs']),
+    'metrics': lambda context: asset_metrics_data(context['asset'], **context['kwargs']),
+    'metrics --prefix': lambda context: assets_metrics_data(prefix=context['prefix'], **context['kwargs']),
+}
+
+
+def setup_catalog(size, args):
+    catalog = stubs.Catalog(size, args.groups, args.partitions)
+    server = stubs.FakeDagsterServer(catalog, args.latency_ms)
+
+    configs_dir = os.path.join(os.environ['HOME'], f"catalog-{size}")
+    os.makedirs(configs_dir)
+    catalog_settings = '\n'.join(f"    {name}: {value}" for name, value in {
+        'num_assets': size, 'num_groups': args.groups, 'partitions': args.partitions, 'latency_ms': args.latency_ms
+    }.items())
+    with open(os.path.join(configs_dir, 'connectors.yml'), 'w') as f:
+        f.write(CONFIG_TEMPLATE.format(endpoint=server.endpoint, catalog=catalog_settings))
+
+    context = {
+        'asset': catalog.assets[0],
+        'prefix': catalog.paths[0][0],
+        'kwargs': {'configs_dir': configs_dir, 'cache_mode': 'off'},
+    }
+
+    return server, context
+
+
+def run_scenario(func, context, runs):
+    # Warm up connectors and the table index first, so runs measure steady state
+    func(context)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(context)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Round trips and memory come from a separate run, as tracing slows everything down
+    stubs.reset_round_trips()
+    tracemalloc.start()
+    func(context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'latency_ms': round(statistics.median(timings), 2),
+        **dict(stubs.ROUND_TRIPS),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Regressions: slower than the baseline beyond tolerance, or more round trips
+    baseline = {(result['size'], result['scenario']): result for result in baseline}
+    regressions = []
+
+    for result in results:
+        previous = baseline.get((result['size'], result['scenario']))
+        if previous is None:
+            continue
+
+        if result['latency_ms'] > previous['latency_ms'] * (1 + tolerance):
+            regressions.append(f"{result['scenario']} ({result['size']} assets): {previous['latency_ms']} ms -> {result['latency_ms']} ms")
+        for service in stubs.ROUND_TRIPS:
+            if result[service] > previous[service]:
+                regressions.append(f"{result['scenario']} ({result['size']} assets): {service} round trips {previous[service]} -> {result[service]}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma separated catalog sizes, in assets')
+    parser.add_argument('--groups', type=int, default=10, help='Number of top-level groups (prefixes) in the catalog')
+    parser.add_argument('--partitions', type=int, default=10, help='Number of S3 objects per asset')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Latency injected in every round trip')
+    parser.add_argument('--runs', type=int, default=3, help='Number of timed runs per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated scenarios to run')
+    parser.add_argument('--save', default=None, help='Write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='Fail on regressions against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed latency increase over the baseline, as a fraction')
+    args = parser.parse_args()
+
+    register_adapter('io-manager', 'bench-s3', stubs.BenchS3Adapter)
+    register_adapter('data-warehouse', 'bench-snowflake', stubs.BenchSnowflakeAdapter)
+
+    print(f"{'assets':>8}  {'scenario':<18} {'latency':>11} {'dagster':>8} {'s3':>8} {'snowflake':>10} {'peak':>10}")
+    results = []
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        server, context = setup_catalog(size, args)
+
+        for name in args.scenarios.split(','):
+            result = {'size': size, 'scenario': name, **run_scenario(SCENARIOS[name], context, args.runs)}
+            results.append(result)
+            print(f"{size:>8}  {name:<18} {result['latency_ms']:>8.1f} ms {result['dagster']:>8} {result['s3']:>8} {result['snowflake']:>10} {result['peak_mb']:>7.2f} MB")
+
+        server.shutdown()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""Local stand-ins for Dagster, S3 and Snowflake, serving a synthetic catalog.
+
+Every service counts its round trips in `ROUND_TRIPS` and waits `latency_ms` per
+call, so command latency can be measured offline against catalogs of any size.
+"""
+from bisect import bisect_left, bisect_right
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from damn_tool.utils.adapters.io_managers.aws import AWSAdapter
+from damn_tool.utils.adapters.data_warehouses.snowflake import SnowflakeAdapter, TABLE_METADATA_COLUMNS
+
+ROUND_TRIPS = {'dagster': 0, 's3': 0, 'snowflake': 0}
+_round_trips_lock = threading.Lock()
+
+BASE_TIME = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def count_round_trip(service, latency_ms):
+    with _round_trips_lock:
+        ROUND_TRIPS[service] += 1
+    if latency_ms:
+        time.sleep(latency_ms / 1000)
+
+
+def reset_round_trips():
+    for service in ROUND_TRIPS:
+        ROUND_TRIPS[service] = 0
+
+
+class Catalog:
+    # Synthetic catalog: `num_assets` assets spread over `num_groups` groups, each asset depending
+    # on the previous one of its group, and stored as `partitions` objects
+    def __init__(self, num_assets, num_groups=10, partitions=10):
+        self.num_groups = max(1, min(num_groups, num_assets))
+        self.partitions = partitions
+        self.assets = sorted(f"group_{i % self.num_groups:03d}/asset_{i:06d}" for i in range(num_assets))
+        self.paths = [asset.split('/') for asset in self.assets]
+        self.index = {asset: i for i, asset in enumerate(self.assets)}
+
+    def get_dependencies(self, i):
+        group, name = self.paths[i]
+        number = int(name[len('asset_'):])
+        if number < self.num_groups:
+            return []
+        return [[group, f"asset_{number - self.num_groups:06d}"]]
+
+    def get_dependents(self, i):
+        group, name = self.paths[i]
+        dependent = f"{group}/asset_{int(name[len('asset_'):]) + self.num_groups:06d}"
+        return [dependent.split('/')] if dependent in self.index else []
+
+
+class DagsterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which would otherwise add delayed-ACK stalls to kept-alive connections
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        count_round_trip('dagster', self.server.latency_ms)
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        body = json.dumps(self.server.resolve(payload['query'], payload.get('variables') or {})).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeDagsterServer(ThreadingHTTPServer):
+    # Answers the GraphQL documents DAMN sends: catalog pages and batched `assetOrError` lookups
+    daemon_threads = True
+
+    def __init__(self, catalog, latency_ms=0):
+        super().__init__(('127.0.0.1', 0), DagsterHandler)
+        self.catalog = catalog
+        self.latency_ms = latency_ms
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/graphql"
+
+    def get_asset(self, i):
+        timestamp = (BASE_TIME + datetime.timedelta(minutes=i)).timestamp()
+        return {
+            '__typename': 'Asset',
+            'id': self.catalog.assets[i],
+            'definition': {
+                'description': f"Synthetic asset {self.catalog.assets[i]}",
+                'computeKind': 'python',
+                'autoMaterializePolicy': None,
+                'freshnessPolicy': None,
+                'isPartitioned': True,
+                'dependedByKeys': [{'path': path} for path in self.catalog.get_dependents(i)],
+                'dependencyKeys': [{'path': path} for path in self.catalog.get_dependencies(i)],
+                'freshnessInfo': None,
+                'partitionStats': {'numPartitions': self.catalog.partitions, 'numMaterialized': self.catalog.partitions, 'numFailed': 0},
+            },
+            'assetMaterializations': [{
+                'runId': f"run-{i}",
+                'timestamp': str(int(timestamp * 1000)),
+                'stepStats': {'stepKey': 'step', 'status': 'SUCCESS', 'startTime': timestamp - 60, 'endTime': timestamp},
+                'metadataEntries': [{'__typename': 'IntMetadataEntry', 'label': 'rows', 'description': None, 'intValue': i}],
+            }],
+        }
+
+    def resolve(self, query, variables):
+        if 'assetsOrError' in query:
+            prefix = variables.get('prefix') or []
+            start = 0
+            if variables.get('cursor'):
+                start = bisect_right(self.catalog.paths, json.loads(variables['cursor']))
+            limit = variables.get('limit') or len(self.catalog.assets)
+
+            nodes = []
+            for i in range(start, len(self.catalog.assets)):
+                if len(nodes) == limit:
+                    break
+                if self.catalog.paths[i][:len(prefix)] != prefix:
+                    continue
+                nodes.append({'key': {'path': self.catalog.paths[i]}, 'definition': {'dependencyKeys': [{'path': path} for path in self.catalog.get_dependencies(i)]}})
+
+            return {'data': {'assetsOrError': {'__typename': 'AssetConnection', 'nodes': nodes}}}
+
+        data = {}
+        for alias, variable in re.findall(r'(a\d+): assetOrError\(assetKey: \$(k\d+)\)', query):
+            i = self.catalog.index.get('/'.join(variables[variable]['path']))
+            data[alias] = self.get_asset(i) if i is not None else {'__typename': 'AssetNotFoundError', 'message': 'Asset not found'}
+
+        return {'data': data}
+
+
+class VirtualKeys:
+    # Sorted S3 keys of the catalog, computed on access so millions of objects take no memory
+    def __init__(self, catalog, key_prefix):
+        self.catalog = catalog
+        self.key_prefix = key_prefix
+
+    def __len__(self):
+        return len(self.catalog.assets) * self.catalog.partitions
+
+    def __getitem__(self, i):
+        asset, partition = divmod(i, self.catalog.partitions)
+        return f"{self.key_prefix}/{self.catalog.assets[asset]}/part-{partition:05d}.parquet"
+
+
+class StubS3Client:
+    # Implements the subset of the boto3 S3 client used by the AWS adapter
+    def __init__(self, catalog, key_prefix, latency_ms=0):
+        self.keys = VirtualKeys(catalog, key_prefix)
+        self.latency_ms = latency_ms
+
+    def get_object(self, i):
+        return {
+            'Key': self.keys[i],
+            'Size': 1024 + (i * 7919) % 65536,
+            'LastModified': BASE_TIME + datetime.timedelta(seconds=i),
+        }
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, StartAfter=None, ContinuationToken=None):
+        count_round_trip('s3', self.latency_ms)
+
+        after = ContinuationToken or StartAfter
+        start = bisect_right(self.keys, after) if after else bisect_left(self.keys, Prefix)
+        start = max(start, bisect_left(self.keys, Prefix))
+
+        contents = []
+        i = start
+        while i < len(self.keys) and len(contents) < MaxKeys:
+            key = self.keys[i]
+            if not key.startswith(Prefix):
+                break
+            contents.append(self.get_object(i))
+            i += 1
+
+        truncated = i < len(self.keys) and self.keys[i].startswith(Prefix)
+        page = {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': truncated}
+        if truncated:
+            page['NextContinuationToken'] = contents[-1]['Key']
+
+        return page
+
+    def get_paginator(self, operation):
+        return StubPaginator(self)
+
+
+class StubPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, Bucket, Prefix='', StartAfter=None, PaginationConfig=None):
+        page_size = (PaginationConfig or {}).get('PageSize', 1000)
+        token = None
+
+        while True:
+            page = self.client.list_objects_v2(Bucket=Bucket, Prefix=Prefix, MaxKeys=page_size, StartAfter=StartAfter, ContinuationToken=token)
+            yield page
+            if not page['IsTruncated']:
+                break
+            token = page['NextContinuationToken']
+
+
+class BenchS3Adapter(AWSAdapter):
+    def __init__(self, config):
+        self.config = config
+        self.max_workers = config.get('max_workers', 8)
+        self.page_size = config.get('page_size', 1000)
+        self.shards = config.get('shards', 16)
+
+        catalog = Catalog(config['num_assets'], config['num_groups'], config['partitions'])
+        self.s3 = StubS3Client(catalog, config['key_prefix'], config.get('latency_ms', 0))
+
+
+class SQLiteCursor:
+    # Translates the Snowflake SQL sent by the adapter to SQLite
+    def __init__(self, conn, latency_ms):
+        self.cursor = conn.cursor()
+        self.latency_ms = latency_ms
+        self.description = None
+
+    def execute(self, sql, params=None):
+        count_round_trip('snowflake', self.latency_ms)
+
+        sql = re.sub(r'\w+\.information_schema\.tables', 'tables', sql, flags=re.IGNORECASE)
+        sql = sql.replace('::timestamp_ltz', '').replace('%s', '?')
+        self.cursor.execute(sql, params or [])
+        self.description = self.cursor.description
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def fetch_arrow_batches(self):
+        import snowflake.connector
+
+        raise snowflake.connector.errors.NotSupportedError("No Arrow batches from SQLite")
+
+    def close(self):
+        self.cursor.close()
+
+
+class BenchSnowflakeAdapter(SnowflakeAdapter):
+    # In-memory SQLite stand-in holding one table per asset
+    def __init__(self, config):
+        self.config = config
+        self.latency_ms = config.get('latency_ms', 0)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.execute(f"create table tables ({', '.join(TABLE_METADATA_COLUMNS)})")
+
+        catalog = Catalog(config['num_assets'], config['num_groups'], config['partitions'])
+        self.conn.executemany(
+            f"insert into tables values ({', '.join(['?'] * len(TABLE_METADATA_COLUMNS))})",
+            [
+                (config['database'], 'ANALYTICS', path[-1].upper(), 'BASE TABLE', 1000 * i, 65536 * i,
+                 str(BASE_TIME), str(BASE_TIME + datetime.timedelta(minutes=i)), None, 1, None)
+                for i, path in enumerate(catalog.paths)
+            ]
+        )
+        self.cur = self.cursor()
+
+    def cursor(self):
+        return SQLiteCursor(self.conn, self.latency_ms)
+
+    def fetch_batches(self, sql, params=None, batch_size=10000):
+        cur = self.cursor()
+        cur.execute(sql, params)
+        columns = [column[0].lower() for column in cur.description]
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield columns, rows
+
+    def close(self):
+        pass
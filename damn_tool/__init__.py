@@ -3,12 +3,41 @@ import click
 from .ls import ls
 from .show import show
 from .metrics import metrics
+from .usage import usage
+from .lineage import lineage
+from .serve import serve
+from .snapshot import snapshot
+from .trend import trend
+from .report import report
+from .index import index
+from .diff import diff
+from .utils import tracing
 
 @click.group()
+@click.option('--profile', is_flag=True, help='Time connector calls, config loading and rendering, and print a summary when done')
+@click.option('--trace-file', default=None, type=click.Path(dir_okay=False, writable=True), help='Also write the timings as a Chrome trace-event JSON file (implies --profile)')
 @click.pass_context
-def cli(ctx):
-    pass
+def cli(ctx, profile, trace_file):
+    if profile or trace_file:
+        tracing.enable()
+        ctx.call_on_close(lambda: report_profile(trace_file))
+
+
+def report_profile(trace_file):
+    click.echo(tracing.format_summary(tracing.summarize()), err=True)
+    if trace_file:
+        tracing.write_chrome_trace(trace_file)
+        click.echo(f"Trace written to {trace_file}", err=True)
+
 
 cli.add_command(ls)
 cli.add_command(show)
-cli.add_command(metrics)
\ No newline at end of file
+cli.add_command(metrics)
+cli.add_command(usage)
+cli.add_command(lineage)
+cli.add_command(serve)
+cli.add_command(snapshot)
+cli.add_command(trend)
+cli.add_command(report)
+cli.add_command(index)
+cli.add_command(diff)
\ No newline at end of file
@@ -0,0 +1,308 @@
+import click
+from functools import partial
+import hashlib
+import json
+
+from .ls import iter_asset_pages
+from .show import get_data_warehouse_data_batch, get_orchestrator_data_batch, parse_orchestrator_data
+from .utils.cache import get_cache_mode, open_cache
+from .utils.helpers import (
+    build_command_output,
+    init_connector,
+    run_concurrently,
+    serialize_command_output
+)
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
+
+# Attributes hashed and compared between deployments. The latest materialization's metadata and the
+# tables' created and last altered times differ between any two deployments, so they're left out.
+# Schemas are often named after their deployment, so they're only compared with --compare-schemas.
+DIFF_FIELDS = {
+    'orchestrator': ['description', 'computeKind', 'policyType', 'maximumLagMinutes', 'cronSchedule', 'isPartitioned', 'dependencyKeys', 'dependedByKeys'],
+    'data_warehouse': ['table_type']
+}
+SCHEMA_FIELDS = ['table_schema']
+
+ASSET_DEFINITIONS_QUERY = """
+query AssetDefinitionsQuery($prefix: [String!], $cursor: String, $limit: Int) {
+  assetsOrError(prefix: $prefix, cursor: $cursor, limit: $limit) {
+    ... on AssetConnection {
+      nodes {
+        key {
+          path
+        }
+        definition {
+          description
+          computeKind
+          autoMaterializePolicy{
+            policyType
+          }
+          freshnessPolicy{
+            maximumLagMinutes
+            cronSchedule
+          }
+          isPartitioned
+          dependedByKeys {
+            path
+          }
+          dependencyKeys {
+            path
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def hash_value(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def normalize_field(field, value):
+    # Dependencies are compared as sorted `/` separated keys, whatever order they're listed in
+    if field in ('dependencyKeys', 'dependedByKeys') and value is not None:
+        return sorted("/".join(path) for path in value)
+    return value
+
+
+def get_diff_fields(compare_schemas=False):
+    return {**DIFF_FIELDS, 'data_warehouse': DIFF_FIELDS['data_warehouse'] + (SCHEMA_FIELDS if compare_schemas else [])}
+
+
+def get_compared_attributes(sections, fields):
+    # The normalized attributes of each section, exactly what's hashed and then compared. None for a
+    # section without an answer.
+    return {
+        section: {field: normalize_field(field, sections[section].get(field)) for field in section_fields} if sections.get(section) is not None else None
+        for section, section_fields in fields.items()
+    }
+
+
+def iter_definition_pages(orchestrator_connector, prefix, page_size=None):
+    # Page through the catalog with each asset's definition, a single query per page, parsed like `show`'s
+    def parse_node(node):
+        return "/".join(node['key']['path']), parse_orchestrator_data({'__typename': 'Asset', 'definition': node.get('definition') or {}})
+
+    for page in iter_asset_pages(orchestrator_connector, prefix, page_size, ASSET_DEFINITIONS_QUERY, parse_node):
+        yield dict(page)
+
+
+def get_asset_hashes(orchestrator_connector, data_warehouse_connector, prefix, cache, fields, page_size=None):
+    # {asset: hash} of the attributes compared between deployments. Definitions come from the paged
+    # catalog listing, and table attributes from a few bulk lookups shared with `show` through the
+    # cache, so no per-asset query is needed.
+    def compute():
+        definitions = {}
+        for page in iter_definition_pages(orchestrator_connector, prefix, page_size):
+            definitions.update(page)
+
+        assets = list(definitions)
+        tables = cache.fetch_many(data_warehouse_connector, 'show', assets, partial(get_data_warehouse_data_batch, data_warehouse_connector)) if data_warehouse_connector else {}
+
+        return {
+            asset: hash_value(get_compared_attributes({'orchestrator': definition, 'data_warehouse': tables.get(asset)}, fields))
+            for asset, definition in definitions.items()
+        }
+
+    command = f"diff-hashes:{data_warehouse_connector.profile if data_warehouse_connector else ''}:{hash_value(fields)}"
+    return cache.fetch(orchestrator_connector, command, prefix or '', compute)
+
+
+def build_hash_tree(hashes):
+    # Merkle tree of the asset hashes by key section: each prefix's hash covers its children's names
+    # and hashes, so two trees are compared from the top, skipping the prefixes with equal hashes
+    root = {'leaf': None, 'children': {}}
+
+    for asset, leaf in hashes.items():
+        node = root
+        for section in asset.split('/'):
+            node = node['children'].setdefault(section, {'leaf': None, 'children': {}})
+        node['leaf'] = leaf
+
+    set_tree_hashes(root)
+    return root
+
+
+def set_tree_hashes(node):
+    digest = hashlib.sha1((node['leaf'] or '').encode())
+    node['count'] = int(node['leaf'] is not None)
+
+    for name in sorted(node['children']):
+        child = node['children'][name]
+        digest.update(f"\0{name}\0{set_tree_hashes(child)}".encode())
+        node['count'] += child['count']
+
+    node['hash'] = digest.hexdigest()
+    return node['hash']
+
+
+def iter_tree_assets(node, path):
+    if node['leaf'] is not None:
+        yield path
+    for name, child in node['children'].items():
+        yield from iter_tree_assets(child, f"{path}/{name}" if path else name)
+
+
+def compare_hash_trees(source, target, stats, path=''):
+    # Yields (asset, change) for the assets added, removed or changed between the two trees
+    if source['hash'] == target['hash']:
+        stats['unchanged'] += source['count']
+        return
+
+    if source['leaf'] != target['leaf']:
+        if source['leaf'] is None:
+            yield path, 'added'
+        elif target['leaf'] is None:
+            yield path, 'removed'
+        else:
+            yield path, 'changed'
+    elif source['leaf'] is not None:
+        stats['unchanged'] += 1
+
+    for name in sorted(set(source['children']) | set(target['children'])):
+        child_path = f"{path}/{name}" if path else name
+        if name not in target['children']:
+            for asset in iter_tree_assets(source['children'][name], child_path):
+                yield asset, 'removed'
+        elif name not in source['children']:
+            for asset in iter_tree_assets(target['children'][name], child_path):
+                yield asset, 'added'
+        else:
+            yield from compare_hash_trees(source['children'][name], target['children'][name], stats, child_path)
+
+
+def get_asset_details(orchestrator_connector, data_warehouse_connector, assets, cache, chunk_size=None):
+    # Same attributes as `show`, shared with it through the cache
+    return {
+        'orchestrator': partial(cache.fetch_many, orchestrator_connector, 'show', assets, partial(get_orchestrator_data_batch, orchestrator_connector, chunk_size=chunk_size)),
+        'data_warehouse': partial(cache.fetch_many, data_warehouse_connector, 'show', assets, partial(get_data_warehouse_data_batch, data_warehouse_connector)) if data_warehouse_connector else None
+    }
+
+
+def get_field_changes(source, target):
+    changes = {}
+
+    for section in source:
+        if source[section] is None or target[section] is None:
+            continue
+        for field, before in source[section].items():
+            after = target[section][field]
+            if before != after:
+                changes[field] = {'from': before, 'to': after}
+
+    return changes
+
+
+def init_diff_connectors(profile, data_warehouse, configs_dir):
+    # A deployment is an orchestrator profile, with the data warehouse profile of the same name unless set otherwise
+    orchestrator_connector = init_connector('orchestrator', profile, configs_dir)
+    if orchestrator_connector is None:
+        raise click.UsageError(f"No orchestrator profile named {profile}")
+
+    data_warehouse_connector = init_connector('data-warehouse', data_warehouse or profile, configs_dir)
+    if data_warehouse and data_warehouse_connector is None:
+        raise click.UsageError(f"No data warehouse profile named {data_warehouse}")
+
+    return orchestrator_connector, data_warehouse_connector
+
+
+def diff_catalogs_data(source, target, prefix=None, source_data_warehouse=None, target_data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', page_size=None, compare_schemas=False):
+    fields = get_diff_fields(compare_schemas)
+    source_orchestrator, source_data_warehouse = init_diff_connectors(source, source_data_warehouse, configs_dir)
+    target_orchestrator, target_data_warehouse = init_diff_connectors(target, target_data_warehouse, configs_dir)
+    cache = open_cache(configs_dir, cache_mode)
+
+    # Warehouse attributes are only compared when both deployments have a data warehouse
+    if source_data_warehouse is None or target_data_warehouse is None:
+        source_data_warehouse = target_data_warehouse = None
+
+    # Hash both catalogs concurrently, then only look into the prefixes whose hashes differ
+    hashes = run_concurrently({
+        'source': partial(get_asset_hashes, source_orchestrator, source_data_warehouse, prefix, cache, fields, page_size),
+        'target': partial(get_asset_hashes, target_orchestrator, target_data_warehouse, prefix, cache, fields, page_size)
+    })
+
+    for side, profile in [('source', source), ('target', target)]:
+        if hashes[side] is None:
+            raise click.ClickException(f"Could not list the assets of {profile}")
+
+    stats = {'unchanged': 0}
+    changes = {'added': [], 'removed': [], 'changed': []}
+    for asset, change in compare_hash_trees(build_hash_tree(hashes['source']), build_hash_tree(hashes['target']), stats):
+        changes[change].append(asset)
+
+    # Only the changed assets are fetched in detail, from both deployments at once
+    changed = {}
+    errors = {}
+    if changes['changed']:
+        tasks = {}
+        for side, orchestrator_connector, data_warehouse_connector in [('source', source_orchestrator, source_data_warehouse), ('target', target_orchestrator, target_data_warehouse)]:
+            for section, task in get_asset_details(orchestrator_connector, data_warehouse_connector, changes['changed'], cache, chunk_size).items():
+                tasks[(side, section)] = task
+        details = run_concurrently(tasks, max_workers=4)
+
+        # Assets whose details couldn't be fetched did change, they're reported apart rather than as unchanged
+        failed = [f"{section.replace('_', ' ')} attributes of {source if side == 'source' else target}" for (side, section), result in details.items() if tasks[(side, section)] is not None and result is None]
+
+        for asset in changes['changed']:
+            if failed:
+                errors[asset] = f"Could not fetch the {', '.join(failed)}"
+                continue
+
+            asset_changes = get_field_changes(
+                get_compared_attributes({section: (details[('source', section)] or {}).get(asset) for section in fields}, fields),
+                get_compared_attributes({section: (details[('target', section)] or {}).get(asset) for section in fields}, fields)
+            )
+            # Hashes can still differ without any attribute doing so, e.g. a catalog changing between the two passes
+            if asset_changes:
+                changed[asset] = asset_changes
+            else:
+                stats['unchanged'] += 1
+
+    data = {
+        'Summary': {
+            'from': source,
+            'to': target,
+            'from_assets': len(hashes['source']),
+            'to_assets': len(hashes['target']),
+            'unchanged': stats['unchanged'],
+            'added': len(changes['added']),
+            'removed': len(changes['removed']),
+            'changed': len(changed),
+            'errors': len(errors)
+        },
+        'Added': sorted(changes['added']) or None,
+        'Removed': sorted(changes['removed']) or None,
+        'Changed': changed or None,
+        'Errors': errors or None
+    }
+
+    # Package catalog differences
+    return build_command_output('diff', data)
+
+
+def diff_catalogs(source, target, prefix=None, source_data_warehouse=None, target_data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', page_size=None, compare_schemas=False):
+    # Same as diff_catalogs_data, serialized to JSON
+    return serialize_command_output(diff_catalogs_data(source, target, prefix, source_data_warehouse, target_data_warehouse, configs_dir, chunk_size, cache_mode, page_size, compare_schemas))
+
+
+@click.command()
+@click.option('--from', 'source', required=True, help='Orchestrator profile of the deployment to compare from, e.g. prod')
+@click.option('--to', 'target', required=True, help='Orchestrator profile of the deployment to compare to, e.g. staging')
+@click.option('--from-data-warehouse', default=None, help='Data warehouse profile of the --from deployment. Defaults to the profile named like its orchestrator profile, if any')
+@click.option('--to-data-warehouse', default=None, help='Data warehouse profile of the --to deployment. Defaults to the profile named like its orchestrator profile, if any')
+@click.option('--prefix', default=None, help='Only compare assets with a given prefix')
+@click.option('--compare-schemas', is_flag=True, help='Also compare the schemas of the warehouse tables, for deployments whose schemas are named alike')
+@click.option('--batch-size', default=None, type=int, help='Number of assets combined into a single orchestrator query. Defaults to the `batch_size` connector setting, or 50')
+@click.option('--page-size', default=None, type=int, help='Number of assets fetched per orchestrator request. Defaults to the `page_size` connector setting, or 1000')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+def diff(source, target, from_data_warehouse, to_data_warehouse, prefix, compare_schemas, batch_size, page_size, output, configs_dir, refresh, no_cache):
+    """Compare the assets of two deployments"""
+    command_output = diff_catalogs_data(source, target, prefix, from_data_warehouse, to_data_warehouse, configs_dir, batch_size, get_cache_mode(refresh, no_cache), page_size, compare_schemas)
+
+    render(command_output, output)
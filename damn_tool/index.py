@@ -0,0 +1,26 @@
+import click
+
+from .ls import refresh_asset_index
+from .utils.asset_index import open_asset_index
+from .utils.helpers import init_connectors
+
+
+@click.command()
+@click.option('--page-size', default=None, type=int, help='Number of assets fetched per orchestrator request. Defaults to the `page_size` connector setting, or 1000')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+@click.option('--quiet', is_flag=True, help='Do not print a summary of the changes')
+def index(page_size, orchestrator, configs_dir, quiet):
+    """Refresh the local asset index used by `ls --search` and shell completion"""
+    asset_index = open_asset_index(orchestrator, configs_dir)
+    if asset_index is None:
+        raise click.UsageError("The asset index needs an orchestrator connector to list the catalog")
+
+    try:
+        orchestrator_connector, _, _ = init_connectors(orchestrator, None, None, configs_dir)
+        summary = refresh_asset_index(asset_index, orchestrator_connector, page_size)
+    finally:
+        asset_index.close()
+
+    if not quiet:
+        click.echo(f"Indexed {summary['assets']} assets ({summary['added']} added, {summary['removed']} removed)")
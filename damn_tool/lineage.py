@@ -0,0 +1,93 @@
+import click
+from functools import partial
+
+from .metrics import get_data_warehouse_data_batch, get_io_manager_data
+from .utils.asset_graph import get_asset_graph
+from .utils.asset_index import complete_asset_keys
+from .utils.cache import get_cache_mode, open_cache
+from .utils.daemon import run_command
+from .utils.helpers import (
+    init_connectors,
+    map_assets,
+    build_command_output,
+    serialize_command_output,
+    run_concurrently
+)
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
+
+
+def get_subgraph_sizes(io_manager_connector, data_warehouse_connector, assets, cache):
+    # Per-asset sizes are shared with `damn metrics` through the metadata cache, so each asset is only looked up once
+    results = run_concurrently({
+        "IO Manager": partial(cache.fetch_many, io_manager_connector, 'metrics', assets, partial(map_assets, get_io_manager_data, io_manager_connector)) if io_manager_connector else None,
+        "Data Warehouse": partial(cache.fetch_many, data_warehouse_connector, 'metrics', assets, partial(get_data_warehouse_data_batch, data_warehouse_connector)) if data_warehouse_connector else None
+    })
+
+    io_manager_data = [data for data in (results["IO Manager"] or {}).values() if data]
+    data_warehouse_data = [data for data in (results["Data Warehouse"] or {}).values() if data]
+
+    return {
+        'assets': len(assets),
+        'files': sum(data['files'] or 0 for data in io_manager_data) if results["IO Manager"] is not None else None,
+        'size': sum(data['size'] or 0 for data in io_manager_data) if results["IO Manager"] is not None else None,
+        'row_count': sum(data['row_count'] or 0 for data in data_warehouse_data) if results["Data Warehouse"] is not None else None,
+        'bytes': sum(data['bytes'] or 0 for data in data_warehouse_data) if results["Data Warehouse"] is not None else None
+    }
+
+
+def asset_lineage_data(asset, upstream=True, downstream=True, depth=None, target=None, sizes=False, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use'):
+    orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    cache = open_cache(configs_dir, cache_mode)
+
+    if orchestrator_connector is None:
+        raise click.UsageError("The lineage command needs an orchestrator connector")
+
+    # All traversals are answered locally, from the graph fetched once and cached
+    graph = get_asset_graph(orchestrator_connector, cache)
+
+    try:
+        data = {
+            'Upstream': graph.traverse(asset, 'upstream', depth) if upstream else None,
+            'Downstream': graph.traverse(asset, 'downstream', depth) if downstream else None,
+            'Path': graph.path(asset, target) if target else None,
+            'Sizes': None
+        }
+    except KeyError as e:
+        raise click.UsageError(e.args[0])
+
+    if sizes:
+        subgraph = [asset] + list(data['Upstream'] or {}) + list(data['Downstream'] or {})
+        data['Sizes'] = get_subgraph_sizes(io_manager_connector, data_warehouse_connector, subgraph, cache)
+
+    # Package asset lineage
+    return build_command_output('lineage', data)
+
+
+def asset_lineage(asset, upstream=True, downstream=True, depth=None, target=None, sizes=False, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use'):
+    # Same as asset_lineage_data, serialized to JSON
+    return serialize_command_output(asset_lineage_data(asset, upstream, downstream, depth, target, sizes, orchestrator, io_manager, data_warehouse, configs_dir, cache_mode))
+
+
+@click.command()
+@click.argument('asset', required=True, shell_complete=complete_asset_keys)
+@click.option('--upstream', is_flag=True, help='Only show the assets this asset depends on')
+@click.option('--downstream', is_flag=True, help='Only show the assets depending on this asset')
+@click.option('--depth', default=None, type=int, help='Maximum number of hops to follow. Unlimited by default')
+@click.option('--to', 'target', default=None, help='Show the lineage path between the asset and this one')
+@click.option('--sizes', is_flag=True, help='Roll up IO manager and data warehouse sizes over the asset and its lineage')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
+@click.option('--io_manager', default=None, help='IO manager service provider to use')
+@click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+def lineage(asset, upstream, downstream, depth, target, sizes, orchestrator, io_manager, data_warehouse, output, configs_dir, refresh, no_cache):
+    """Show your asset's upstream and downstream lineage"""
+    # Both directions are shown unless one is picked
+    if not upstream and not downstream:
+        upstream = downstream = True
+
+    command_output = run_command(asset_lineage_data, asset=asset, upstream=upstream, downstream=downstream, depth=depth, target=target, sizes=sizes, orchestrator=orchestrator, io_manager=io_manager, data_warehouse=data_warehouse, configs_dir=configs_dir, cache_mode=get_cache_mode(refresh, no_cache))
+
+    render(command_output, output)
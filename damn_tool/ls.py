@@ -1,77 +1,166 @@
 import click
 import json
-import pyperclip
 
+from .utils.asset_index import open_asset_index, refresh_in_background
+from .utils.cache import get_cache_mode, open_cache
+from .utils.daemon import request_command
 from .utils.helpers import (
+    build_command_output,
     init_connectors,
-    package_command_output, 
-    print_packaged_command_output, 
-    run_and_capture
+    serialize_command_output
 )
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render_asset_keys
 
+DEFAULT_PAGE_SIZE = 1000
 
-def get_orchestrator_data(orchestrator_connector, prefix):
-    # Get data
-    if prefix:
-      prefix_list = prefix.split('/')
-      query = f"""
-      query AssetsQuery {{
-        assetsOrError(prefix: {json.dumps(prefix_list)}) {{
-          ... on AssetConnection {{
-            nodes {{
-              key {{
-                path
-              }}
-            }}
-          }}
-        }}
-      }}
-      """
-    else:
-      query = """
-      query AssetsQuery {
-        assetsOrError {
-          ... on AssetConnection {
-            nodes {
-              key {
-                path
-              }
-            }
-          }
+# Catalogs up to this size are also stored in the metadata cache while being streamed
+CACHEABLE_ASSET_COUNT = 10000
+
+
+ASSETS_QUERY = """
+query AssetsQuery($prefix: [String!], $cursor: String, $limit: Int) {
+  assetsOrError(prefix: $prefix, cursor: $cursor, limit: $limit) {
+    ... on AssetConnection {
+      nodes {
+        key {
+          path
         }
       }
-      """
+    }
+  }
+}
+"""
+
+
+def get_orchestrator_data(orchestrator_connector, prefix, cursor=None, limit=None, query=ASSETS_QUERY):
+    # Get one page of assets, starting after `cursor`
+    variables = {
+        'prefix': prefix.split('/') if prefix else None,
+        'cursor': cursor,
+        'limit': limit
+    }
+
+    result = orchestrator_connector.execute(query, variables)
 
-    result = orchestrator_connector.execute(query)
-    
     return result
 
 
-def list_assets(prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None):
+def get_asset_key(node):
+    return "/".join(node['key']['path'])
+
+
+def iter_asset_pages(orchestrator_connector, prefix, page_size=None, query=ASSETS_QUERY, parse_node=get_asset_key):
+    # Page through the catalog, yielding each page as it arrives: the `/` separated asset keys, or
+    # what `parse_node` makes of the nodes selected by `query`. Queries take the same $prefix,
+    # $cursor and $limit variables as ASSETS_QUERY, and select each node's key.
+    page_size = page_size or orchestrator_connector.config.get('page_size', DEFAULT_PAGE_SIZE)
+    cursor = None
+
+    while True:
+        result = get_orchestrator_data(orchestrator_connector, prefix, cursor, page_size, query)
+        nodes = result['data']['assetsOrError']['nodes']
+
+        yield [parse_node(node) for node in nodes]
+
+        if len(nodes) < page_size:
+            break
+
+        # Dagster's cursor is the last asset key, serialized as a JSON list
+        cursor = json.dumps(nodes[-1]['key']['path'])
+
+
+def iter_asset_keys(orchestrator_connector, prefix, cache, page_size=None):
+    # Stream asset keys from the cache when possible, otherwise page by page from the orchestrator
+    key = cache.make_key(orchestrator_connector, 'asset-keys', prefix or '')
+    hit, asset_keys = cache.get(key, cache.get_ttl(orchestrator_connector))
+
+    if hit:
+        yield asset_keys
+        return
+
+    # Only small catalogs are kept around for the cache, so memory stays flat for large ones
+    cacheable = []
+
+    for page in iter_asset_pages(orchestrator_connector, prefix, page_size):
+        if cacheable is not None:
+            cacheable += page
+            if len(cacheable) > CACHEABLE_ASSET_COUNT:
+                cacheable = None
+
+        yield page
+
+    if cacheable is not None:
+        cache.set(key, cacheable)
+
+
+def get_asset_keys(orchestrator_connector, prefix, cache, page_size=None):
+    return [asset for page in iter_asset_keys(orchestrator_connector, prefix, cache, page_size) for asset in page]
+
+
+def list_assets_data(prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use', page_size=None):
     orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
-    
-    orchestrator_data = get_orchestrator_data(orchestrator_connector, prefix) if orchestrator_connector else None
-    packaged_command_output = package_command_output('ls', orchestrator_data)
-    
-    return packaged_command_output
+    cache = open_cache(configs_dir, cache_mode)
+
+    orchestrator_data = get_asset_keys(orchestrator_connector, prefix, cache, page_size) if orchestrator_connector else []
+
+    return build_command_output('ls', orchestrator_data)
+
+
+def refresh_asset_index(index, orchestrator_connector, page_size=None):
+    # Lists the whole catalog again, the index only writes what changed
+    return index.refresh(iter_asset_pages(orchestrator_connector, None, page_size))
+
+
+def search_asset_keys(search, prefix=None, orchestrator=None, configs_dir=None, cache_mode='use', page_size=None):
+    # Asset keys matching `search`, from the local asset index. The index is built on first use and
+    # refreshed in the background once stale (or right away with --refresh).
+    index = open_asset_index(orchestrator, configs_dir)
+    if index is None:
+        return []
+
+    try:
+        if cache_mode == 'refresh' or not index.is_built():
+            orchestrator_connector, _, _ = init_connectors(orchestrator, None, None, configs_dir)
+            refresh_asset_index(index, orchestrator_connector, page_size)
+        else:
+            refresh_in_background(index, orchestrator, configs_dir)
+
+        return [asset for asset in index.search(search) if not prefix or asset.startswith(prefix)]
+    finally:
+        index.close()
+
+
+def list_assets(prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use', page_size=None):
+    # Same as list_assets_data, serialized to JSON
+    return serialize_command_output(list_assets_data(prefix, orchestrator, io_manager, data_warehouse, configs_dir, cache_mode, page_size))
 
 
 @click.command()
 @click.option('--prefix', default=None, help='Get list of assets with a given prefix')
+@click.option('--search', default=None, help='Only list assets whose key contains this text (case insensitive), or the closest keys when none does. Answered from the local asset index')
+@click.option('--page-size', default=None, type=int, help='Number of assets fetched per orchestrator request. Defaults to the `page_size` connector setting, or 1000')
 @click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
 @click.option('--io_manager', default=None, help='IO manager service provider to use')
 @click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
-@click.option('--output', default='terminal', help='Destination for command output. Options include `terminal` (default) for standard output, `json` to format output as JSON, or `copy` to copy the output to the clipboard.')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
 @click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
-def ls(prefix, orchestrator, io_manager, data_warehouse, output, configs_dir):
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+def ls(prefix, search, page_size, orchestrator, io_manager, data_warehouse, output, configs_dir, refresh, no_cache):
     """List your platform's data assets"""
-    packaged_command_output = list_assets(prefix, orchestrator, io_manager, data_warehouse, configs_dir)
-
-    if output == 'json':
-        print(packaged_command_output)
-    elif output == 'copy':
-        print_output = run_and_capture(print_packaged_command_output, packaged_command_output)
-        markdown_output = print_output.replace('\x1b[36m- ', '- ').replace('\x1b[0m', '')  # Removing the color codes
-        pyperclip.copy(markdown_output)
+    cache_mode = get_cache_mode(refresh, no_cache)
+
+    if search is not None:
+        render_asset_keys([search_asset_keys(search, prefix, orchestrator, configs_dir, cache_mode, page_size)], output)
+        return
+
+    # A running daemon answers with the whole listing, otherwise pages are streamed as they arrive
+    command_output = request_command('list_assets_data', {'prefix': prefix, 'orchestrator': orchestrator, 'io_manager': io_manager, 'data_warehouse': data_warehouse, 'configs_dir': configs_dir, 'cache_mode': cache_mode, 'page_size': page_size})
+
+    if command_output is not None:
+        pages = [command_output['ls']]
     else:
-        print_packaged_command_output(packaged_command_output)
\ No newline at end of file
+        orchestrator_connector, _, _ = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+        cache = open_cache(configs_dir, cache_mode)
+        pages = iter_asset_keys(orchestrator_connector, prefix, cache, page_size) if orchestrator_connector else iter([])
+    render_asset_keys(pages, output)
@@ -1,56 +1,116 @@
 import click
 import datetime
-import json
-import pyperclip
+from functools import partial
+import threading
+import time
 from typing import Dict, Optional
 
+from .ls import get_asset_keys
+from .utils.asset_index import complete_asset_keys
+from .utils.cache import get_cache_mode, open_cache
+from .utils.table_index import get_asset_tables
+from .utils.daemon import run_command
 from .utils.helpers import (
     init_connectors,
-    package_command_output, 
-    print_packaged_command_output, 
-    run_and_capture
+    map_assets,
+    build_command_output,
+    serialize_command_output,
+    run_concurrently
 )
+from .utils.limits import rate_limited
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
+from .utils.stats import Distribution
 
 
-def get_orchestrator_data(orchestrator_connector, asset):
-    asset_list = asset.split('/')
-
-    query = f"""
-    query AssetMetricsByKey {{
-        assetOrError(assetKey: {{path: {json.dumps(asset_list)}}}) {{
-            __typename
-            ... on Asset {{
-                id
-                assetMaterializations(limit: 1){{
-                    runId
-                    timestamp
-                    stepStats{{
-                        stepKey
-                        status
-                        startTime
-                        endTime
-                    }}
-                }}
-                definition{{
-                    freshnessInfo{{
-                        currentMinutesLate
-                    }}
-                    partitionStats{{
-                        numPartitions
-                        numMaterialized
-                        numFailed
-                    }}
-                }}
-            }}
-            ... on AssetNotFoundError {{
-                message
-            }}
-        }}
-    }}
-    """
-
-    result = orchestrator_connector.execute(query)
+ASSET_METRICS_SELECTION = """
+    __typename
+    ... on Asset {
+        id
+        assetMaterializations(limit: 1){
+            runId
+            timestamp
+            stepStats{
+                stepKey
+                status
+                startTime
+                endTime
+            }
+        }
+        definition{
+            freshnessInfo{
+                currentMinutesLate
+            }
+            partitionStats{
+                numPartitions
+                numMaterialized
+                numFailed
+            }
+        }
+    }
+    ... on AssetNotFoundError {
+        message
+    }
+"""
+
+ASSET_HISTORY_SELECTION = """
+    ... on Asset {
+        assetMaterializations(beforeTimestampMillis: $before, limit: $limit){
+            runId
+            timestamp
+            stepStats{
+                status
+                startTime
+                endTime
+            }
+        }
+    }
+"""
+
+ASSET_PARTITION_COUNT_SELECTION = """
+    ... on Asset {
+        definition{
+            isPartitioned
+            partitionStats{
+                numPartitions
+            }
+        }
+    }
+"""
+
+ASSET_PARTITION_KEYS_SELECTION = """
+    ... on Asset {
+        definition{
+            partitionKeysByDimension(startIdx: $start, endIdx: $end){
+                name
+                partitionKeys
+            }
+        }
+    }
+"""
+
+# Number of materializations fetched per page with --history, unless set with `history_page_size`
+HISTORY_PAGE_SIZE = 100
+
+ASSET_FINGERPRINT_SELECTION = """
+    ... on Asset {
+        assetMaterializations(limit: 1){
+            runId
+            timestamp
+        }
+    }
+"""
+
+ASSET_NEW_MATERIALIZATIONS_SELECTION = """
+    ... on Asset {
+        assetMaterializations(afterTimestampMillis: $after, limit: 1){
+            runId
+            timestamp
+        }
+    }
+"""
+
 
+def parse_orchestrator_data(asset_info):
     data: Dict[str, Optional[str]] = {
         'run_id': None,
         'status': None,
@@ -62,13 +122,11 @@ def get_orchestrator_data(orchestrator_connector, asset):
         'num_failed': None
     }
 
-    asset_info = result["data"]["assetOrError"]
-
     # Get AssetMaterializations attributes
     if not asset_info or 'assetMaterializations' not in asset_info:
         return data
     
-    else:
+    elif asset_info['assetMaterializations']:
         first_materialization = asset_info['assetMaterializations'][0]
         data['run_id'] = first_materialization['runId'] if 'runId' in first_materialization else None
 
@@ -100,9 +158,100 @@ def get_orchestrator_data(orchestrator_connector, asset):
     return data
 
 
+def get_orchestrator_data_batch(orchestrator_connector, assets, chunk_size=None):
+    results = orchestrator_connector.execute_batch('AssetMetricsByKey', ASSET_METRICS_SELECTION, assets, chunk_size)
+
+    return {asset: parse_orchestrator_data(results[asset]) for asset in assets}
+
+
+def get_orchestrator_data(orchestrator_connector, asset):
+    return get_orchestrator_data_batch(orchestrator_connector, [asset])[asset]
+
+
+def iter_materializations(orchestrator_connector, asset, count, page_size, first_page=None):
+    # Latest `count` materializations of an asset, newest first, one page at a time
+    materializations = first_page
+    before = None
+
+    while count > 0:
+        limit = min(page_size, count)
+        if materializations is None:
+            asset_info = orchestrator_connector.execute_batch('AssetMaterializationHistory', ASSET_HISTORY_SELECTION, [asset], None, {'before': ('String', before), 'limit': ('Int', limit)})[asset]
+            materializations = (asset_info or {}).get('assetMaterializations') or []
+
+        yield from materializations[:count]
+        if len(materializations) < limit:
+            return
+
+        count -= len(materializations)
+        before = materializations[-1]['timestamp']
+        materializations = None
+
+
+def summarize_history(materializations):
+    # Durations, failures and time between materializations, aggregated as the pages stream
+    # by: memory doesn't grow with the number of runs
+    durations = Distribution()
+    intervals = Distribution()
+    runs = 0
+    failures = 0
+    previous_timestamp = None
+    first_timestamp = None
+
+    for materialization in materializations:
+        runs += 1
+        step_stats = materialization.get('stepStats') or {}
+
+        if step_stats.get('status') not in (None, 'SUCCESS'):
+            failures += 1
+        if step_stats.get('startTime') is not None and step_stats.get('endTime') is not None:
+            durations.add(step_stats['endTime'] - step_stats['startTime'])
+
+        timestamp = float(materialization['timestamp']) / 1000
+        if previous_timestamp is None:
+            first_timestamp = timestamp
+        else:
+            intervals.add(previous_timestamp - timestamp)
+        previous_timestamp = timestamp
+
+    durations, intervals = durations.summary(), intervals.summary()
+
+    return {
+        'runs': runs,
+        'failures': failures,
+        'failure_rate': round(failures / runs, 4) if runs else None,
+        'duration_p50': durations['p50'],
+        'duration_p95': durations['p95'],
+        'duration_max': durations['max'],
+        'interval_p50': intervals['p50'],
+        'interval_p95': intervals['p95'],
+        'interval_max': intervals['max'],
+        'latest': datetime.datetime.fromtimestamp(first_timestamp).strftime('%Y-%m-%d %H:%M:%S') if first_timestamp is not None else None,
+        'oldest': datetime.datetime.fromtimestamp(previous_timestamp).strftime('%Y-%m-%d %H:%M:%S') if previous_timestamp is not None else None,
+    }
+
+
+def get_orchestrator_history_batch(orchestrator_connector, assets, history, chunk_size=None):
+    # The first page of every asset comes from one batched query, later pages are fetched per asset
+    page_size = min(history, orchestrator_connector.config.get('history_page_size', HISTORY_PAGE_SIZE))
+    results = orchestrator_connector.execute_batch('AssetMaterializationHistory', ASSET_HISTORY_SELECTION, assets, chunk_size, {'before': ('String', None), 'limit': ('Int', page_size)})
+
+    data = {}
+    for asset in assets:
+        first_page = (results[asset] or {}).get('assetMaterializations') or []
+        data[asset] = summarize_history(iter_materializations(orchestrator_connector, asset, history, page_size, first_page))
+
+    return data
+
+
+def get_orchestrator_history(orchestrator_connector, asset, history):
+    return get_orchestrator_history_batch(orchestrator_connector, [asset], history)[asset]
+
+
 def get_io_manager_data(io_manager_connector, asset):
-    # Get S3 items with that asset name
-    s3_items = io_manager_connector.list_objects_and_folders(io_manager_connector.config['bucket_name'], io_manager_connector.config['key_prefix'] + "/" + asset)
+    # Get the S3 items stored for that asset: either a single file, or a folder of partitions
+    asset_prefix = io_manager_connector.config['key_prefix'] + "/" + asset
+    s3_items = io_manager_connector.summarize_items(io_manager_connector.config['bucket_name'], asset_prefix, [asset_prefix, asset_prefix + "/"])
     
     if s3_items:  # Ensure s3_items is not empty
         return {
@@ -118,70 +267,356 @@ def get_io_manager_data(io_manager_connector, asset):
         }
 
 
-def get_data_warehouse_data(data_warehouse_connector, asset):
-    asset = asset.lower()  # Make sure the asset name is lower case
-    asset_name = asset.split('/')[-1]  # Get the last section after splitting by '/'
+def select_partition_range(keys, first=None, last=None):
+    # Keys from `first` to `last` included, either open-ended. Bounds that aren't keys themselves are
+    # compared to the keys, so `2023-07-01..2023-07-31` covers the hourly partitions of July.
+    start = 0
+    if first:
+        start = keys.index(first) if first in keys else next((i for i, key in enumerate(keys) if key >= first), len(keys))
 
-    sql = f"""select
-        row_count,
-        bytes
+    end = len(keys)
+    if last:
+        end = keys.index(last) + 1 if last in keys else next((i + 1 for i in range(len(keys) - 1, -1, -1) if keys[i] <= last or keys[i].startswith(last)), 0)
 
-    from information_schema.tables 
-    where lower(table_name) = '{asset_name}'
-    and lower(table_schema) like '%analytics%'
-    """
+    return keys[start:end]
 
-    result, description = data_warehouse_connector.execute(sql)
-    data_warehouse_connector.close()
 
-    if result is not None:
-        result_dict = dict(zip([column[0] for column in description], result))
-        return {
-            'row_count': result_dict.get('ROW_COUNT', None),
-            'bytes': result_dict.get('BYTES', None)
-        }
-    else:
-        return {
-            'row_count': None,
-            'bytes': None
+def get_partition_keys_batch(orchestrator_connector, assets, latest_partitions=None, partition_range=None, chunk_size=None):
+    # Keys of the partitions to report on, per asset: the latest `latest_partitions` ones, those
+    # from the first to the last key of `partition_range` (which wins when both are given), or all of them.
+    # None for assets that aren't partitioned, or are partitioned along several dimensions, which are listed as a whole.
+    counts = orchestrator_connector.execute_batch('AssetPartitionCount', ASSET_PARTITION_COUNT_SELECTION, assets, chunk_size)
+
+    # Assets sharing a partitions definition have as many partitions, so their keys come from the same batched query
+    slices = {}
+    for asset in assets:
+        definition = (counts[asset] or {}).get('definition') or {}
+        if not definition.get('isPartitioned'):
+            continue
+        if latest_partitions and not partition_range:
+            total = (definition.get('partitionStats') or {}).get('numPartitions') or 0
+            slices.setdefault((max(0, total - latest_partitions), total), []).append(asset)
+        else:
+            slices.setdefault((None, None), []).append(asset)
+
+    partition_keys = {asset: None for asset in assets}
+    for (start, end), sliced_assets in slices.items():
+        results = orchestrator_connector.execute_batch('AssetPartitionKeys', ASSET_PARTITION_KEYS_SELECTION, sliced_assets, chunk_size, {'start': ('Int', start), 'end': ('Int', end)})
+
+        for asset in sliced_assets:
+            dimensions = ((results[asset] or {}).get('definition') or {}).get('partitionKeysByDimension') or []
+            if len(dimensions) != 1:
+                continue
+
+            keys = dimensions[0]['partitionKeys']
+            partition_keys[asset] = select_partition_range(keys, *partition_range) if partition_range else keys
+
+    return partition_keys
+
+
+def get_io_manager_partitions_data(io_manager_connector, asset, partition_keys, by_partition=False):
+    # Only the objects of the given partitions are listed, stored under `asset/partition_key`
+    # as a file (with an optional `partition_extension`) or a folder
+    asset_prefix = io_manager_connector.config['key_prefix'] + "/" + asset
+    extension = io_manager_connector.config.get('partition_extension', '')
+
+    items = {}
+    for partition_key in partition_keys:
+        for item_key in (f"{asset_prefix}/{partition_key}", f"{asset_prefix}/{partition_key}{extension}", f"{asset_prefix}/{partition_key}/"):
+            items[item_key] = partition_key
+
+    partitions = {partition_key: {'files': 0, 'size': 0, 'last_modified': None} for partition_key in partition_keys}
+    if items:
+        for s3_item in io_manager_connector.summarize_items(io_manager_connector.config['bucket_name'], asset_prefix + "/", list(items)):
+            partition = partitions[items[s3_item['key']]]
+            partition['files'] += s3_item['num_files']
+            partition['size'] += s3_item['file_size']
+            partition['last_modified'] = max(filter(None, [partition['last_modified'], s3_item['last_modified_ts']]), default=None)
+
+    data = {
+        'files': sum(partition['files'] for partition in partitions.values()),
+        'size': sum(partition['size'] for partition in partitions.values()),
+        'last_modified': max(filter(None, [partition['last_modified'] for partition in partitions.values()]), default=None),
+        'partitions': len(partitions),
+        'missing_partitions': sum(1 for partition in partitions.values() if not partition['files'])
+    }
+    if by_partition:
+        data['by_partition'] = partitions
+
+    return data
+
+
+def get_io_manager_data_batch(io_manager_connector, assets, orchestrator_connector=None, latest_partitions=None, partition_range=None, by_partition=False, chunk_size=None):
+    # With a partition selection, partitioned assets only get their selected partitions listed.
+    # Other assets are listed as a whole.
+    partition_keys = {}
+    if orchestrator_connector and (latest_partitions or partition_range or by_partition):
+        partition_keys = get_partition_keys_batch(orchestrator_connector, assets, latest_partitions, partition_range, chunk_size)
+
+    def get_data(io_manager_connector, asset):
+        if partition_keys.get(asset) is None:
+            return get_io_manager_data(io_manager_connector, asset)
+        return get_io_manager_partitions_data(io_manager_connector, asset, partition_keys[asset], by_partition)
+
+    return map_assets(get_data, io_manager_connector, assets)
+
+
+def get_io_manager_command(latest_partitions=None, partition_range=None, by_partition=False):
+    # Metrics of a partition selection are cached apart from those of whole assets
+    selection = [
+        f"latest={latest_partitions}" if latest_partitions else None,
+        f"range={partition_range[0] or ''}..{partition_range[1] or ''}" if partition_range else None,
+        'by-partition' if by_partition else None
+    ]
+    return ':'.join(['metrics'] + [part for part in selection if part])
+
+
+def get_data_warehouse_data_batch(data_warehouse_connector, assets):
+    tables = get_asset_tables(data_warehouse_connector, assets)
+
+    data = {}
+    for asset in assets:
+        table = tables[asset]
+        data[asset] = {
+            'row_count': table.get('row_count', None),
+            'bytes': table.get('bytes', None)
         }
 
+    return data
+
+
+def get_data_warehouse_data(data_warehouse_connector, asset):
+    return get_data_warehouse_data_batch(data_warehouse_connector, [asset])[asset]
+
+
+def get_materialization_fingerprints(orchestrator_connector, assets, chunk_size=None):
+    # `runId:timestamp` of the latest materialization of each asset, None for assets never materialized
+    results = orchestrator_connector.execute_batch('AssetMaterializationFingerprints', ASSET_FINGERPRINT_SELECTION, assets, chunk_size)
+
+    fingerprints = {}
+    for asset in assets:
+        materializations = (results[asset] or {}).get('assetMaterializations') or []
+        fingerprints[asset] = f"{materializations[0]['runId']}:{materializations[0]['timestamp']}" if materializations else None
 
-def asset_metrics(asset, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None):
+    return fingerprints
+
+
+def make_fingerprint_lookup(orchestrator_connector, cache, chunk_size=None, prefetch=None):
+    # Looks fingerprints up once, for all the sections needing them (and all the `prefetch` assets at
+    # the first lookup). None without an orchestrator to ask, or unless cached answers are read:
+    # with `refresh`, fingerprinted answers would only be written, never looked up.
+    if orchestrator_connector is None or cache.mode != 'use':
+        return None
+
+    fingerprints = {}
+    lock = threading.Lock()
+    get_fingerprints = rate_limited(orchestrator_connector, get_materialization_fingerprints)
+
+    def lookup(assets):
+        with lock:
+            missing = [asset for asset in dict.fromkeys(list(prefetch or []) + list(assets)) if asset not in fingerprints]
+            if missing:
+                try:
+                    fingerprints.update(get_fingerprints(orchestrator_connector, missing, chunk_size))
+                except Exception:
+                    # Fingerprints only save work, so answers are computed as usual without them
+                    fingerprints.update({asset: None for asset in missing})
+
+            return {asset: fingerprints[asset] for asset in assets}
+
+    return lookup
+
+
+def fetch_fingerprinted(cache, connector, command, assets, func, fingerprint_lookup):
+    # IO manager and data warehouse answers only change when their asset is materialized again, so
+    # past their TTL they are reused while the asset's latest materialization stays the same
+    if fingerprint_lookup is None:
+        return func(assets)
+    return cache.fetch_many(connector, command, assets, func, fingerprint_lookup(assets))
+
+
+def asset_metrics_data(asset, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use', history=None, latest_partitions=None, partition_range=None, by_partition=False):
     orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    cache = open_cache(configs_dir, cache_mode)
+    io_manager_command = get_io_manager_command(latest_partitions, partition_range, by_partition)
+    fingerprint_lookup = make_fingerprint_lookup(orchestrator_connector, cache)
     
-    orchestrator_data = get_orchestrator_data(orchestrator_connector, asset) if orchestrator_connector else None
-    io_manager_data = get_io_manager_data(io_manager_connector, asset) if io_manager_connector else None
-    data_warehouse_data = get_data_warehouse_data(data_warehouse_connector, asset) if data_warehouse_connector else None
+    # Query all connectors concurrently, unless their answer is already cached
+    tasks = {
+        "Orchestrator Metrics": partial(cache.fetch, orchestrator_connector, 'metrics', asset, partial(get_orchestrator_data, orchestrator_connector, asset)) if orchestrator_connector else None,
+        "IO Manager Metrics": partial(cache.fetch, io_manager_connector, io_manager_command, asset, lambda: fetch_fingerprinted(cache, io_manager_connector, io_manager_command, [asset], partial(get_io_manager_data_batch, io_manager_connector, orchestrator_connector=orchestrator_connector, latest_partitions=latest_partitions, partition_range=partition_range, by_partition=by_partition), fingerprint_lookup)[asset]) if io_manager_connector else None,
+        "Data Warehouse Metrics": partial(cache.fetch, data_warehouse_connector, 'metrics', asset, lambda: fetch_fingerprinted(cache, data_warehouse_connector, 'metrics', [asset], partial(get_data_warehouse_data_batch, data_warehouse_connector), fingerprint_lookup)[asset]) if data_warehouse_connector else None
+    }
+    if history:
+        tasks["Orchestrator History"] = partial(cache.fetch, orchestrator_connector, f"metrics-history:{history}", asset, lambda: fetch_fingerprinted(cache, orchestrator_connector, f"metrics-history:{history}", [asset], partial(get_orchestrator_history_batch, orchestrator_connector, history=history), fingerprint_lookup)[asset]) if orchestrator_connector else None
+    data = run_concurrently(tasks, max_workers=len(tasks))
 
-    data = {
-        "Orchestrator Metrics": orchestrator_data,
-        "IO Manager Metrics": io_manager_data,
-        "Data Warehouse Metrics": data_warehouse_data
+    # Package asset metrics
+    return build_command_output('metrics', data)
+
+
+def asset_metrics(asset, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use', history=None, latest_partitions=None, partition_range=None, by_partition=False):
+    # Same as asset_metrics_data, serialized to JSON
+    return serialize_command_output(asset_metrics_data(asset, orchestrator, io_manager, data_warehouse, configs_dir, cache_mode, history, latest_partitions, partition_range, by_partition))
+
+
+def get_assets_metrics(assets=None, prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', history=None, latest_partitions=None, partition_range=None, by_partition=False):
+    # Raw metrics of each asset, keyed by asset then section
+    orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    cache = open_cache(configs_dir, cache_mode)
+
+    # Resolve the list of assets to report on
+    assets = list(assets or [])
+    if prefix and orchestrator_connector:
+        requested = set(assets)
+        assets += [asset for asset in get_asset_keys(orchestrator_connector, prefix, cache) if asset not in requested]
+
+    # Query all connectors concurrently, each one working through the assets missing from the cache
+    io_manager_command = get_io_manager_command(latest_partitions, partition_range, by_partition)
+    fingerprint_lookup = make_fingerprint_lookup(orchestrator_connector, cache, chunk_size)
+    tasks = {
+        "Orchestrator Metrics": partial(cache.fetch_many, orchestrator_connector, 'metrics', assets, partial(get_orchestrator_data_batch, orchestrator_connector, chunk_size=chunk_size)) if orchestrator_connector else None,
+        "IO Manager Metrics": partial(cache.fetch_many, io_manager_connector, io_manager_command, assets, partial(fetch_fingerprinted, cache, io_manager_connector, io_manager_command, func=partial(get_io_manager_data_batch, io_manager_connector, orchestrator_connector=orchestrator_connector, latest_partitions=latest_partitions, partition_range=partition_range, by_partition=by_partition, chunk_size=chunk_size), fingerprint_lookup=fingerprint_lookup)) if io_manager_connector else None,
+        "Data Warehouse Metrics": partial(cache.fetch_many, data_warehouse_connector, 'metrics', assets, partial(fetch_fingerprinted, cache, data_warehouse_connector, 'metrics', func=partial(get_data_warehouse_data_batch, data_warehouse_connector), fingerprint_lookup=fingerprint_lookup)) if data_warehouse_connector else None
     }
+    if history:
+        tasks["Orchestrator History"] = partial(cache.fetch_many, orchestrator_connector, f"metrics-history:{history}", assets, partial(fetch_fingerprinted, cache, orchestrator_connector, f"metrics-history:{history}", func=partial(get_orchestrator_history_batch, orchestrator_connector, history=history, chunk_size=chunk_size), fingerprint_lookup=fingerprint_lookup)) if orchestrator_connector else None
+    results = run_concurrently(tasks, max_workers=len(tasks))
 
-    # Package and output asset information
-    packaged_command_output = package_command_output('metrics', data)
-    
-    return packaged_command_output
+    data = {}
+    for asset in assets:
+        data[asset] = {section: (section_data or {}).get(asset) for section, section_data in results.items()}
+
+    return data
+
+
+def assets_metrics_data(assets=None, prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', history=None, latest_partitions=None, partition_range=None, by_partition=False):
+    data = get_assets_metrics(assets, prefix, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, cache_mode, history, latest_partitions, partition_range, by_partition)
+
+    # Package metrics, keyed by asset
+    return build_command_output('metrics', data, batch=True)
+
+
+def assets_metrics(assets=None, prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', history=None, latest_partitions=None, partition_range=None, by_partition=False):
+    # Same as assets_metrics_data, serialized to JSON
+    return serialize_command_output(assets_metrics_data(assets, prefix, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, cache_mode, history, latest_partitions, partition_range, by_partition))
+
+
+def get_new_materializations(orchestrator_connector, assets, after, chunk_size=None):
+    # Latest materialization of each asset materialized after `after` (in milliseconds), in one batched query
+    results = orchestrator_connector.execute_batch('AssetMaterializationsAfter', ASSET_NEW_MATERIALIZATIONS_SELECTION, assets, chunk_size, {'after': ('String', str(after))})
+
+    return {
+        asset: asset_info['assetMaterializations'][0]
+        for asset, asset_info in results.items()
+        if asset_info and asset_info.get('assetMaterializations')
+    }
+
+
+def diff_metrics(previous, current):
+    # Fields whose value changed, as {section: {field: {'from': ..., 'to': ...}}}
+    changes = {}
+
+    for section, fields in current.items():
+        previous_fields = (previous or {}).get(section) or {}
+        section_changes = {field: {'from': previous_fields.get(field), 'to': value} for field, value in (fields or {}).items() if previous_fields.get(field) != value}
+
+        if section_changes:
+            changes[section] = section_changes
+
+    return changes
+
+
+def watch_metrics(assets=None, prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', interval=30, output='terminal', latest_partitions=None, partition_range=None, by_partition=False):
+    orchestrator_connector, _, _ = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    if orchestrator_connector is None:
+        raise click.UsageError("Watching metrics needs an orchestrator connector")
+
+    # Materializations are followed from just before the first report, so none is missed
+    cursor = int(time.time() * 1000)
+    command_output = assets_metrics_data(assets, prefix, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, cache_mode, None, latest_partitions, partition_range, by_partition)
+    render(command_output, output, batch=True)
+
+    current = command_output['metrics']
+    seen = {}
+    refresh_mode = 'off' if cache_mode == 'off' else 'refresh'
+
+    while True:
+        time.sleep(interval)
+
+        # A failed poll (e.g. a service still down after retries) is reported and tried again on the
+        # next interval. The cursor only moves once the metrics are refreshed, so nothing is missed.
+        try:
+            materializations = {
+                asset: materialization
+                for asset, materialization in get_new_materializations(orchestrator_connector, list(current), cursor, chunk_size).items()
+                if seen.get(asset) != (materialization['runId'], materialization['timestamp'])
+            }
+            if not materializations:
+                continue
+
+            # Only the assets materialized again are refreshed, and only what changed is printed
+            refreshed = assets_metrics_data(list(materializations), None, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, refresh_mode, None, latest_partitions, partition_range, by_partition)['metrics']
+        except Exception as e:
+            click.echo(f"Could not check for new materializations, retrying in {interval} seconds: {e}", err=True)
+            continue
+
+        for asset, materialization in materializations.items():
+            seen[asset] = (materialization['runId'], materialization['timestamp'])
+            cursor = max(cursor, int(float(materialization['timestamp'])))
+
+        changes = {asset: diff_metrics(current[asset], refreshed[asset]) for asset in refreshed}
+        current.update(refreshed)
+
+        changes = {asset: asset_changes for asset, asset_changes in changes.items() if asset_changes}
+        if changes:
+            render({'metrics': changes}, output, batch=True)
 
 
 @click.command()
-@click.argument('asset', type=str)
+@click.argument('assets', nargs=-1, type=str, shell_complete=complete_asset_keys)
+@click.option('--prefix', default=None, help='Get metrics for all assets with a given prefix')
+@click.option('--batch-size', default=None, type=int, help='Number of assets combined into a single orchestrator query. Defaults to the `batch_size` connector setting, or 50')
 @click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
 @click.option('--io_manager', default=None, help='IO manager service provider to use')
 @click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
-@click.option('--output', default='terminal', help='Destination for command output. Options include `terminal` (default) for standard output, `json` to format output as JSON, or `copy` to copy the output to the clipboard.')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
 @click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
-def metrics(asset, orchestrator, io_manager, data_warehouse, output, configs_dir):
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+@click.option('--watch', is_flag=True, help='Keep following new materializations, and print the metrics that changed')
+@click.option('--interval', default=30, type=float, help='Seconds between two checks for new materializations, with --watch')
+@click.option('--history', default=None, type=click.IntRange(min=1), help='Add duration, failure and frequency statistics over the last N materializations')
+@click.option('--latest-partitions', default=None, type=click.IntRange(min=1), help='Only list the IO manager objects of the latest N partitions of partitioned assets')
+@click.option('--partition-range', default=None, help='Only list the IO manager objects of the partitions from FIRST to LAST, as FIRST..LAST (either can be left out)')
+@click.option('--by-partition', is_flag=True, help='Break the IO manager metrics of partitioned assets down per partition')
+def metrics(assets, prefix, batch_size, orchestrator, io_manager, data_warehouse, output, configs_dir, refresh, no_cache, watch, interval, history, latest_partitions, partition_range, by_partition):
     """List your asset's metrics"""
-    packaged_command_output = asset_metrics(asset, orchestrator, io_manager, data_warehouse, configs_dir)
-
-    if output == 'json':
-        print(packaged_command_output)
-    elif output == 'copy':
-        print_output = run_and_capture(print_packaged_command_output, packaged_command_output)
-        markdown_output = print_output.replace('\x1b[36m- ', '- ').replace('\x1b[0m', '')  # Removing the color codes
-        pyperclip.copy(markdown_output)
+    if not assets and not prefix:
+        raise click.UsageError("Provide at least one asset or a --prefix")
+
+    cache_mode = get_cache_mode(refresh, no_cache)
+    if latest_partitions and partition_range is not None:
+        raise click.UsageError("--latest-partitions can't be combined with --partition-range")
+    if partition_range is not None:
+        if '..' not in partition_range:
+            raise click.UsageError("--partition-range must look like FIRST..LAST")
+        partition_range = [bound or None for bound in partition_range.split('..', 1)]
+
+    if watch:
+        if output == 'copy':
+            raise click.UsageError("--watch can't be combined with --output copy")
+        if history:
+            raise click.UsageError("--watch can't be combined with --history")
+        try:
+            watch_metrics(list(assets), prefix, orchestrator, io_manager, data_warehouse, configs_dir, batch_size, cache_mode, interval, output, latest_partitions, partition_range, by_partition)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if len(assets) == 1 and not prefix:
+        command_output = run_command(asset_metrics_data, asset=assets[0], orchestrator=orchestrator, io_manager=io_manager, data_warehouse=data_warehouse, configs_dir=configs_dir, cache_mode=cache_mode, history=history, latest_partitions=latest_partitions, partition_range=partition_range, by_partition=by_partition)
     else:
-        print_packaged_command_output(packaged_command_output)
\ No newline at end of file
+        command_output = run_command(assets_metrics_data, assets=list(assets), prefix=prefix, orchestrator=orchestrator, io_manager=io_manager, data_warehouse=data_warehouse, configs_dir=configs_dir, chunk_size=batch_size, cache_mode=cache_mode, history=history, latest_partitions=latest_partitions, partition_range=partition_range, by_partition=by_partition)
+
+    render(command_output, output, batch=len(assets) != 1 or prefix is not None)
\ No newline at end of file
@@ -0,0 +1,259 @@
+import click
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import datetime
+import json
+import os
+import sys
+import threading
+
+from .ls import iter_asset_keys
+from .metrics import fetch_fingerprinted, get_data_warehouse_data_batch, get_io_manager_data_batch, get_orchestrator_data_batch, make_fingerprint_lookup
+from .utils.cache import get_cache_mode, open_cache
+from .utils.helpers import init_connectors
+from .utils.limits import get_concurrency, rate_limited
+
+REPORT_FORMATS = ('ndjson', 'csv')
+
+# One flat record per asset, in this column order
+REPORT_FIELDS = [
+    'asset',
+    'run_id',
+    'status',
+    'start_time',
+    'end_time',
+    'elapsed_time',
+    'num_partitions',
+    'num_materialized',
+    'num_failed',
+    'files',
+    'size',
+    'last_modified',
+    'row_count',
+    'bytes',
+    'errors',
+]
+
+
+def build_report_record(asset, sections, errors):
+    record = {'asset': asset}
+    for section_data in sections.values():
+        record.update(section_data or {})
+
+    record = {field: record.get(field) for field in REPORT_FIELDS}
+    if isinstance(record['last_modified'], datetime.datetime):
+        record['last_modified'] = record['last_modified'].isoformat()
+    record['errors'] = '; '.join(errors) or None
+
+    return record
+
+
+def read_reported_assets(path, report_format):
+    # Assets already reported without errors, so a resumed run skips them. The file is rewritten
+    # without the other records: those with errors, to be redone, and one cut short by an interrupted run.
+    if not os.path.exists(path):
+        return set()
+
+    reported = set()
+    temporary_file = path + '.tmp'
+
+    with open(path, newline='') as f, open(temporary_file, 'w', newline='') as rewritten:
+        if report_format == 'csv':
+            writer = csv.DictWriter(rewritten, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            for record in csv.DictReader(f):
+                if None not in record.values() and not record['errors']:
+                    reported.add(record['asset'])
+                    writer.writerow(record)
+        else:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                record = json.loads(line)
+                if not record.get('errors'):
+                    reported.add(record['asset'])
+                    rewritten.write(line)
+
+    os.replace(temporary_file, path)
+
+    return reported
+
+
+class ReportWriter:
+    # Writes and flushes each record as soon as its asset is done
+    def __init__(self, path, report_format, append=False):
+        self.report_format = report_format
+        self.count = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+        if path == '-':
+            self.file = sys.stdout
+            write_header = True
+        else:
+            write_header = not (append and os.path.exists(path) and os.path.getsize(path))
+            self.file = open(path, 'a' if append else 'w', newline='')
+
+        if report_format == 'csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=REPORT_FIELDS)
+            if write_header:
+                self.csv_writer.writeheader()
+
+    def write(self, record):
+        with self._lock:
+            if self.report_format == 'csv':
+                self.csv_writer.writerow(record)
+            else:
+                self.file.write(json.dumps(record) + '\n')
+            self.file.flush()
+
+            self.count += 1
+            if record['errors']:
+                self.failed += 1
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def run_report(asset_keys, orchestrator_connector, io_manager_connector, data_warehouse_connector, cache, writer, chunk_size=None, max_pending=None, skip=None):
+    # Assets flow from the catalog listing through the orchestrator, IO manager and data warehouse
+    # stages, which run concurrently, each with its own pool sized by the connector's `concurrency`
+    # and calls paced by its `rate_limit`. An asset is written as soon as its last stage is done.
+    chunk_size = chunk_size or orchestrator_connector.config.get('batch_size', 50)
+    max_pending = max(max_pending or 10 * chunk_size, chunk_size)
+
+    stages = {
+        section: {
+            'executor': ThreadPoolExecutor(max_workers=get_concurrency(connector)),
+            'func': rate_limited(connector, func)
+        }
+        for section, connector, func in [
+            ('orchestrator', orchestrator_connector, lambda chunk, fingerprint_lookup: cache.fetch_many(orchestrator_connector, 'metrics', chunk, lambda assets: get_orchestrator_data_batch(orchestrator_connector, assets, chunk_size))),
+            ('io_manager', io_manager_connector, lambda chunk, fingerprint_lookup: cache.fetch_many(io_manager_connector, 'metrics', chunk, lambda assets: fetch_fingerprinted(cache, io_manager_connector, 'metrics', assets, lambda assets: get_io_manager_data_batch(io_manager_connector, assets), fingerprint_lookup))),
+            ('data_warehouse', data_warehouse_connector, lambda chunk, fingerprint_lookup: cache.fetch_many(data_warehouse_connector, 'metrics', chunk, lambda assets: fetch_fingerprinted(cache, data_warehouse_connector, 'metrics', assets, lambda assets: get_data_warehouse_data_batch(data_warehouse_connector, assets), fingerprint_lookup))),
+        ]
+        if connector is not None
+    }
+
+    # Assets in flight, bounded so memory stays flat however large the catalog
+    pending = {}
+    pending_lock = threading.Lock()
+    slots = threading.Semaphore(max_pending)
+    write_errors = []
+
+    def complete(section, chunk, future):
+        # Queued calls are cancelled when the run is interrupted
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        results = future.result() if error is None else {}
+
+        with pending_lock:
+            finished = []
+            for asset in chunk:
+                entry = pending[asset]
+                entry['sections'][section] = results.get(asset)
+                if error is not None:
+                    entry['errors'].append(f"{section}: {error}")
+                entry['remaining'] -= 1
+                if entry['remaining'] == 0:
+                    finished.append((asset, pending.pop(asset)))
+
+        for asset, entry in finished:
+            try:
+                writer.write(build_report_record(asset, entry['sections'], entry['errors']))
+            except Exception as e:
+                write_errors.append(e)
+            slots.release()
+
+    def submit(section, chunk, fingerprint_lookup):
+        stage = stages[section]
+        future = stage['executor'].submit(stage['func'], chunk, fingerprint_lookup)
+        future.add_done_callback(lambda future: complete(section, chunk, future))
+
+    def submit_chunk(chunk):
+        # Each stage completes every asset once: the IO manager lists assets one by one, the other
+        # stages take the whole chunk in a single batched call. The fingerprints of the whole chunk
+        # come from a single query too.
+        for asset in chunk:
+            slots.acquire()
+            with pending_lock:
+                pending[asset] = {'sections': {}, 'errors': [], 'remaining': len(stages)}
+
+        fingerprint_lookup = make_fingerprint_lookup(orchestrator_connector, cache, chunk_size, prefetch=chunk)
+        for section in stages:
+            if section == 'io_manager':
+                for asset in chunk:
+                    submit(section, [asset], fingerprint_lookup)
+            else:
+                submit(section, chunk, fingerprint_lookup)
+
+    # When interrupted, the calls already running still get their assets written, so they
+    # aren't redone when the run is resumed
+    interrupted = False
+    try:
+        chunk = []
+        for page in asset_keys:
+            for asset in page:
+                if skip and asset in skip:
+                    continue
+                chunk.append(asset)
+                if len(chunk) == chunk_size:
+                    submit_chunk(chunk)
+                    chunk = []
+            if write_errors:
+                raise write_errors[0]
+
+        if chunk:
+            submit_chunk(chunk)
+    except BaseException:
+        interrupted = True
+        raise
+    finally:
+        for stage in stages.values():
+            stage['executor'].shutdown(wait=True, cancel_futures=interrupted)
+
+    if write_errors:
+        raise write_errors[0]
+
+
+def write_report(path='-', prefix=None, report_format='ndjson', resume=False, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', max_pending=None):
+    # Writes the metrics of every asset (under a prefix) to `path`, and returns a summary of the run
+    orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    if orchestrator_connector is None:
+        raise click.UsageError("Reports need an orchestrator connector to list the catalog")
+
+    skip = read_reported_assets(path, report_format) if resume and path != '-' else set()
+    cache = open_cache(configs_dir, cache_mode)
+
+    writer = ReportWriter(path, report_format, append=resume)
+    try:
+        run_report(iter_asset_keys(orchestrator_connector, prefix, cache), orchestrator_connector, io_manager_connector, data_warehouse_connector, cache, writer, chunk_size, max_pending, skip)
+    finally:
+        writer.close()
+
+    return {'reported': writer.count, 'failed': writer.failed, 'skipped': len(skip)}
+
+
+@click.command()
+@click.option('--prefix', default=None, help='Only report on assets with a given prefix')
+@click.option('--format', 'report_format', default='ndjson', type=click.Choice(REPORT_FORMATS), help='One JSON object or one CSV row per asset')
+@click.option('--out', default='-', type=click.Path(dir_okay=False, allow_dash=True), help='File to write the report to, as each asset is done. Defaults to the standard output')
+@click.option('--resume', is_flag=True, help='Append to an existing --out file, skipping the assets it already reports without errors')
+@click.option('--batch-size', default=None, type=int, help='Number of assets combined into a single orchestrator and data warehouse query. Defaults to the `batch_size` connector setting, or 50')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
+@click.option('--io_manager', default=None, help='IO manager service provider to use')
+@click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+def report(prefix, report_format, out, resume, batch_size, orchestrator, io_manager, data_warehouse, configs_dir, refresh, no_cache):
+    """Write the metrics of all your assets to an NDJSON or CSV file"""
+    if resume and out == '-':
+        raise click.UsageError("--resume needs an --out file")
+
+    summary = write_report(out, prefix, report_format, resume, orchestrator, io_manager, data_warehouse, configs_dir, batch_size, get_cache_mode(refresh, no_cache))
+
+    click.echo(f"Reported {summary['reported']} assets ({summary['failed']} with errors), skipped {summary['skipped']} already reported", err=True)
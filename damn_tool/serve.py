@@ -0,0 +1,46 @@
+import click
+import os
+import threading
+
+from .utils.daemon import read_daemon_info, remove_daemon_info, request_daemon, write_daemon_info
+
+
+@click.command()
+@click.option('--port', default=0, type=int, help='Port to listen on, on 127.0.0.1. Defaults to any free port')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider to warm up')
+@click.option('--io_manager', default=None, help='IO manager service provider to warm up')
+@click.option('--data-warehouse', default=None, help='Data warehouse service provider to warm up')
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+@click.option('--verbose', is_flag=True, help='Log every request')
+@click.option('--stop', is_flag=True, help='Stop the running daemon')
+def serve(port, orchestrator, io_manager, data_warehouse, configs_dir, verbose, stop):
+    """Run a local daemon keeping connectors and caches warm for other commands"""
+    info = read_daemon_info()
+
+    if stop:
+        if info is None or request_daemon('/shutdown', {}, info) is None:
+            raise click.ClickException("No daemon is running")
+        click.echo(f"Stopped the daemon on port {info['port']}")
+        return
+
+    if info is not None and request_daemon('/health', {}, info, timeout=5) is not None:
+        raise click.ClickException(f"A daemon is already running on port {info['port']}")
+
+    # The server and every command module are only imported when actually serving
+    from .server import make_server, warm_connectors
+
+    server = make_server(port, verbose)
+
+    configs_dir = os.path.abspath(configs_dir) if configs_dir else None
+    threading.Thread(target=warm_connectors, args=(orchestrator, io_manager, data_warehouse, configs_dir), daemon=True).start()
+
+    write_daemon_info({'pid': os.getpid(), 'port': server.server_address[1], 'token': server.token})
+    click.echo(f"DAMN daemon listening on 127.0.0.1:{server.server_address[1]}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        remove_daemon_info(os.getpid())
@@ -0,0 +1,92 @@
+import click
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hmac
+import json
+import os
+import secrets
+import threading
+
+from .lineage import asset_lineage_data
+from .ls import list_assets_data
+from .metrics import asset_metrics_data, assets_metrics_data
+from .show import show_asset_data, show_assets_data
+from .usage import asset_usage_data
+from .utils.daemon import REFUSED_STATUS, get_request_fingerprint
+from .utils.helpers import DateTimeEncoder, init_connectors
+
+# Commands the daemon runs on behalf of the CLI
+COMMANDS = {func.__name__: func for func in [
+    list_assets_data,
+    show_asset_data,
+    show_assets_data,
+    asset_metrics_data,
+    assets_metrics_data,
+    asset_usage_data,
+    asset_lineage_data
+]}
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, data):
+        body = json.dumps(data, cls=DateTimeEncoder).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not hmac.compare_digest(self.headers.get('X-Damn-Token', ''), self.server.token):
+            return self.send_json(403, {'error': 'Invalid daemon token'})
+
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        if self.path == '/health':
+            self.send_json(200, {'pid': os.getpid()})
+
+        elif self.path == '/shutdown':
+            self.send_json(200, {'stopped': True})
+            threading.Thread(target=self.server.shutdown).start()
+
+        elif self.path == '/run':
+            func = COMMANDS.get(payload.get('command'))
+            if func is None:
+                return self.send_json(404, {'error': f"Unknown command: {payload.get('command')}"})
+
+            # The CLI's environment would render another config, e.g. with other credentials: it
+            # runs the command itself
+            if payload.get('fingerprint') != get_request_fingerprint(payload.get('kwargs', {}).get('configs_dir')):
+                return self.send_json(REFUSED_STATUS, {'error': 'The daemon renders a different configuration'})
+
+            try:
+                self.send_json(200, func(**payload.get('kwargs', {})))
+            except click.ClickException as e:
+                self.send_json(400, {'error': e.format_message()})
+            except Exception as e:
+                self.send_json(500, {'error': f"{type(e).__name__}: {e}"})
+
+        else:
+            self.send_json(404, {'error': f"Unknown path: {self.path}"})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def warm_connectors(orchestrator, io_manager, data_warehouse, configs_dir):
+    # Log in to every configured service up front, so the first command doesn't pay for it
+    for connector in init_connectors(orchestrator, io_manager, data_warehouse, configs_dir):
+        if connector is not None:
+            try:
+                connector.adapter
+            except Exception as e:
+                click.echo(f"Could not initialize the {connector.connector_type} connector: {e}", err=True)
+
+
+def make_server(port=0, verbose=False):
+    server = ThreadingHTTPServer(('127.0.0.1', port), DaemonHandler)
+    server.daemon_threads = True
+    server.token = secrets.token_hex(32)
+    server.verbose = verbose
+
+    return server
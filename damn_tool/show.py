@@ -1,126 +1,122 @@
 import click
-import json
-import pyperclip
+from functools import partial
 
+from .ls import get_asset_keys
+from .utils.asset_index import complete_asset_keys
+from .utils.cache import get_cache_mode, open_cache
+from .utils.table_index import get_asset_tables
+from .utils.daemon import run_command
 from .utils.helpers import (
+    build_command_output,
     init_connectors,
-    package_command_output, 
-    print_packaged_command_output, 
-    run_and_capture
+    serialize_command_output,
+    run_concurrently
 )
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
 
 
-def get_orchestrator_data(orchestrator_connector, asset):
-    # Split the asset key into a list of strings
-    asset_key = asset.split("/")
-
-    # Get data
-    query = f"""
-    query AssetByKey {{
-      assetOrError(assetKey: {{path: {json.dumps(asset_key)}}}) {{
-        __typename
-        ... on Asset {{
-          definition {{
+ASSET_DETAILS_SELECTION = """
+    __typename
+    ... on Asset {
+      definition {
+        description
+        computeKind
+        autoMaterializePolicy{
+          policyType
+        }
+        freshnessPolicy{
+          maximumLagMinutes
+          cronSchedule
+        }
+        isPartitioned
+        dependedByKeys{
+          path
+        }
+        dependencyKeys{
+          path
+        }
+      }
+      assetMaterializations(limit: 1){
+        timestamp
+        metadataEntries{
+          __typename
+          ... on FloatMetadataEntry{
+            label
             description
-            computeKind
-            autoMaterializePolicy{{
-              policyType
-            }}
-            freshnessPolicy{{
-              maximumLagMinutes
-              cronSchedule
-            }}
-            isPartitioned
-            dependedByKeys{{
-              path
-            }}
-            dependencyKeys{{
+            floatValue
+          }
+          ... on IntMetadataEntry{
+            label
+            description
+            intValue
+          }
+          ... on JsonMetadataEntry{
+            label
+            description
+            jsonString
+          }
+          ... on BoolMetadataEntry{
+            label
+            description
+            boolValue
+          }
+          ... on MarkdownMetadataEntry{
+            label
+            description
+            mdStr
+          }
+          ... on PathMetadataEntry{
+            label
+            description
+            path
+          }
+          ... on NotebookMetadataEntry{
+            label
+            description
+            path
+          }
+          ... on PythonArtifactMetadataEntry{
+            label
+            description
+            module
+            name
+          }
+          ... on TextMetadataEntry{
+            label
+            description
+            text
+          }
+          ... on UrlMetadataEntry{
+            label
+            description
+            url
+          }
+          ... on PipelineRunMetadataEntry{
+            label
+            description
+            runId
+          }
+          ... on AssetMetadataEntry{
+            label
+            description
+            assetKey{
               path
-            }}
-          }}
-          assetMaterializations(limit: 1){{
-            timestamp
-            metadataEntries{{
-              __typename
-              ... on FloatMetadataEntry{{
-                label
-                description
-                floatValue
-              }}
-              ... on IntMetadataEntry{{
-                label
-                description
-                intValue
-              }}
-              ... on JsonMetadataEntry{{
-                label
-                description
-                jsonString
-              }}
-              ... on BoolMetadataEntry{{
-                label
-                description
-                boolValue
-              }}
-              ... on MarkdownMetadataEntry{{
-                label
-                description
-                mdStr
-              }}
-              ... on PathMetadataEntry{{
-                label
-                description
-                path
-              }}
-              ... on NotebookMetadataEntry{{
-                label
-                description
-                path
-              }}
-              ... on PythonArtifactMetadataEntry{{
-                label
-                description
-                module
-                name
-              }}
-              ... on TextMetadataEntry{{
-                label
-                description
-                text
-              }}
-              ... on UrlMetadataEntry{{
-                label
-                description
-                url
-              }}
-              ... on PipelineRunMetadataEntry{{
-                label
-                description
-                runId
-              }}
-              ... on AssetMetadataEntry{{
-                label
-                description
-                assetKey{{
-                  path
-                }}
-              }}
-              ... on NullMetadataEntry{{
-                label
-                description
-              }}
-            }}
-          }}
-        }}
-        ... on AssetNotFoundError {{
-          message
-        }}
-      }}
-    }}
-    """
-
-    result = orchestrator_connector.execute(query)
-    
+            }
+          }
+          ... on NullMetadataEntry{
+            label
+            description
+          }
+        }
+      }
+    }
+    ... on AssetNotFoundError {
+      message
+    }
+"""
+
+
+def parse_orchestrator_data(asset_info):
     # Initialize the return dictionary with some default values
     data = {
         'description': None,
@@ -134,10 +130,8 @@ def get_orchestrator_data(orchestrator_connector, asset):
         'metadataEntries': {}
     }
 
-    # Check for assetOrError and whether it's an Asset
-    if "data" in result and "assetOrError" in result["data"] and result["data"]["assetOrError"]["__typename"] == "Asset":
-        asset_info = result["data"]["assetOrError"]
-
+    # Check whether the assetOrError result is an Asset
+    if asset_info and asset_info["__typename"] == "Asset":
         # Get Definition attributes
         if 'definition' in asset_info:
           definition = asset_info['definition']
@@ -171,74 +165,105 @@ def get_orchestrator_data(orchestrator_connector, asset):
     return data
 
 
-def get_data_warehouse_data(data_warehouse_connector, asset):
-    asset = asset.lower()  # Make sure the asset name is lower case
-    asset_name = asset.split('/')[-1]  # Get the last section after splitting by '/'
-
-    sql = f"""select
-        lower(table_schema) as table_schema,
-        lower(table_type) as table_type,
-        created,
-        last_altered
-
-    from information_schema.tables 
-    where lower(table_name) = '{asset_name}'
-    and lower(table_schema) like '%analytics%'
-    """
-
-    result, description = data_warehouse_connector.execute(sql)
-    data_warehouse_connector.close()
-
-    if result is not None:
-        result_dict = dict(zip([column[0] for column in description], result))
-        return {
-            'table_schema': result_dict.get('TABLE_SCHEMA', None),
-            'table_type': result_dict.get('TABLE_TYPE', None),
-            'created': result_dict.get('CREATED', None),
-            'last_altered': result_dict.get('LAST_ALTERED', None)
-        }
-    else:
-        return {
-            'table_schema': None,
-            'table_type': None,
-            'created': None,
-            'last_altered': None
+def get_orchestrator_data_batch(orchestrator_connector, assets, chunk_size=None):
+    results = orchestrator_connector.execute_batch('AssetByKey', ASSET_DETAILS_SELECTION, assets, chunk_size)
+
+    return {asset: parse_orchestrator_data(results[asset]) for asset in assets}
+
+
+def get_orchestrator_data(orchestrator_connector, asset):
+    return get_orchestrator_data_batch(orchestrator_connector, [asset])[asset]
+
+
+def get_data_warehouse_data_batch(data_warehouse_connector, assets):
+    tables = get_asset_tables(data_warehouse_connector, assets)
+
+    data = {}
+    for asset in assets:
+        table = tables[asset]
+        data[asset] = {
+            'table_schema': table['table_schema'].lower() if table.get('table_schema') else None,
+            'table_type': table['table_type'].lower() if table.get('table_type') else None,
+            'created': table.get('created', None),
+            'last_altered': table.get('last_altered', None)
         }
+
+    return data
+
+
+def get_data_warehouse_data(data_warehouse_connector, asset):
+    return get_data_warehouse_data_batch(data_warehouse_connector, [asset])[asset]
     
 
-def show_asset(asset, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None):
+def show_asset_data(asset, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use'):
     orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    cache = open_cache(configs_dir, cache_mode)
     
-    orchestrator_data = get_orchestrator_data(orchestrator_connector, asset) if orchestrator_connector else None
-    data_warehouse_data = get_data_warehouse_data(data_warehouse_connector, asset) if data_warehouse_connector else None
+    # Query all connectors concurrently, unless their answer is already cached
+    data = run_concurrently({
+        "Orchestrator Attributes": partial(cache.fetch, orchestrator_connector, 'show', asset, partial(get_orchestrator_data, orchestrator_connector, asset)) if orchestrator_connector else None,
+        "Data Warehouse Attributes": partial(cache.fetch, data_warehouse_connector, 'show', asset, partial(get_data_warehouse_data, data_warehouse_connector, asset)) if data_warehouse_connector else None
+    })
 
-    data = {
-        "Orchestrator Attributes": orchestrator_data,
-        "Data Warehouse Attributes": data_warehouse_data
-    }
+    # Package asset information
+    return build_command_output('show', data)
 
-    # Package and output asset information
-    packaged_command_output = package_command_output('show', data)
-    
-    return packaged_command_output
+
+def show_asset(asset, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, cache_mode='use'):
+    # Same as show_asset_data, serialized to JSON
+    return serialize_command_output(show_asset_data(asset, orchestrator, io_manager, data_warehouse, configs_dir, cache_mode))
+
+
+def show_assets_data(assets=None, prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use'):
+    orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    cache = open_cache(configs_dir, cache_mode)
+
+    # Resolve the list of assets to show
+    assets = list(assets or [])
+    if prefix and orchestrator_connector:
+        requested = set(assets)
+        assets += [asset for asset in get_asset_keys(orchestrator_connector, prefix, cache) if asset not in requested]
+
+    # Query all connectors concurrently, each one working through the assets missing from the cache
+    results = run_concurrently({
+        "Orchestrator Attributes": partial(cache.fetch_many, orchestrator_connector, 'show', assets, partial(get_orchestrator_data_batch, orchestrator_connector, chunk_size=chunk_size)) if orchestrator_connector else None,
+        "Data Warehouse Attributes": partial(cache.fetch_many, data_warehouse_connector, 'show', assets, partial(get_data_warehouse_data_batch, data_warehouse_connector)) if data_warehouse_connector else None
+    })
+
+    data = {}
+    for asset in assets:
+        data[asset] = {section: (section_data or {}).get(asset) for section, section_data in results.items()}
+
+    # Package asset information, keyed by asset
+    return build_command_output('show', data, batch=True)
+
+
+def show_assets(assets=None, prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use'):
+    # Same as show_assets_data, serialized to JSON
+    return serialize_command_output(show_assets_data(assets, prefix, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, cache_mode))
 
 
 @click.command()
-@click.argument('asset', required=True)
+@click.argument('assets', nargs=-1, shell_complete=complete_asset_keys)
+@click.option('--prefix', default=None, help='Show details for all assets with a given prefix')
+@click.option('--batch-size', default=None, type=int, help='Number of assets combined into a single orchestrator query. Defaults to the `batch_size` connector setting, or 50')
 @click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
 @click.option('--io_manager', default=None, help='IO manager service provider to use')
 @click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
-@click.option('--output', default='terminal', help='Destination for command output. Options include `terminal` (default) for standard output, `json` to format output as JSON, or `copy` to copy the output to the clipboard.')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
 @click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
-def show(asset, orchestrator, io_manager, data_warehouse, output, configs_dir):
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+def show(assets, prefix, batch_size, orchestrator, io_manager, data_warehouse, output, configs_dir, refresh, no_cache):
     """Show details for a specific asset"""
-    packaged_command_output = show_asset(asset, orchestrator, io_manager, data_warehouse, configs_dir)
-
-    if output == 'json':
-        print(packaged_command_output)
-    elif output == 'copy':
-        print_output = run_and_capture(print_packaged_command_output, packaged_command_output)
-        markdown_output = print_output.replace('\x1b[36m- ', '- ').replace('\x1b[0m', '')  # Removing the color codes
-        pyperclip.copy(markdown_output)
+    if not assets and not prefix:
+        raise click.UsageError("Provide at least one asset or a --prefix")
+
+    cache_mode = get_cache_mode(refresh, no_cache)
+
+    if len(assets) == 1 and not prefix:
+        command_output = run_command(show_asset_data, asset=assets[0], orchestrator=orchestrator, io_manager=io_manager, data_warehouse=data_warehouse, configs_dir=configs_dir, cache_mode=cache_mode)
     else:
-        print_packaged_command_output(packaged_command_output)
\ No newline at end of file
+        command_output = run_command(show_assets_data, assets=list(assets), prefix=prefix, orchestrator=orchestrator, io_manager=io_manager, data_warehouse=data_warehouse, configs_dir=configs_dir, chunk_size=batch_size, cache_mode=cache_mode)
+
+    render(command_output, output, batch=len(assets) != 1 or prefix is not None)
\ No newline at end of file
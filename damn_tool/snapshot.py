@@ -0,0 +1,82 @@
+import click
+import datetime
+import time
+
+from .ls import get_asset_keys
+from .metrics import get_assets_metrics
+from .utils.cache import get_cache_mode, open_cache
+from .utils.helpers import (
+    build_command_output,
+    init_connectors,
+    serialize_command_output
+)
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
+from .utils.snapshots import SnapshotStore, get_snapshots_dir
+
+
+def parse_timestamp(value):
+    # Orchestrator times are reported as local '%Y-%m-%d %H:%M:%S' strings
+    return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp() if value else None
+
+
+def build_snapshot_records(metrics):
+    records = {}
+
+    for asset, sections in metrics.items():
+        orchestrator_data = sections.get("Orchestrator Metrics") or {}
+        io_manager_data = sections.get("IO Manager Metrics") or {}
+        data_warehouse_data = sections.get("Data Warehouse Metrics") or {}
+
+        records[asset] = {
+            'files': io_manager_data.get('files'),
+            'size': io_manager_data.get('size'),
+            'row_count': data_warehouse_data.get('row_count'),
+            'bytes': data_warehouse_data.get('bytes'),
+            'materialized_at': parse_timestamp(orchestrator_data.get('end_time'))
+        }
+
+    return records
+
+
+def take_snapshot_data(prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', path=None):
+    orchestrator_connector, _, _ = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+    if orchestrator_connector is None:
+        raise click.UsageError("Snapshots need an orchestrator connector to list the catalog")
+
+    taken_at = time.time()
+    assets = get_asset_keys(orchestrator_connector, prefix, open_cache(configs_dir, cache_mode))
+    metrics = get_assets_metrics(assets, None, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, cache_mode)
+
+    store = SnapshotStore(path or get_snapshots_dir(orchestrator_connector))
+    store.append(taken_at, build_snapshot_records(metrics), prefix)
+
+    data = {
+        'taken_at': datetime.datetime.fromtimestamp(taken_at).strftime('%Y-%m-%d %H:%M:%S'),
+        'assets': len(assets),
+        'snapshots': store.meta['snapshots']
+    }
+
+    # Package snapshot summary
+    return build_command_output('snapshot', data)
+
+
+def take_snapshot(prefix=None, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None, chunk_size=None, cache_mode='use', path=None):
+    # Same as take_snapshot_data, serialized to JSON
+    return serialize_command_output(take_snapshot_data(prefix, orchestrator, io_manager, data_warehouse, configs_dir, chunk_size, cache_mode, path))
+
+
+@click.command()
+@click.option('--prefix', default=None, help='Only record assets with a given prefix')
+@click.option('--batch-size', default=None, type=int, help='Number of assets combined into a single orchestrator query. Defaults to the `batch_size` connector setting, or 50')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
+@click.option('--io_manager', default=None, help='IO manager service provider to use')
+@click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+@click.option('--refresh', is_flag=True, help='Ignore cached answers and refresh the cache with fresh ones')
+@click.option('--no-cache', is_flag=True, help='Bypass the local metadata cache entirely')
+def snapshot(prefix, batch_size, orchestrator, io_manager, data_warehouse, output, configs_dir, refresh, no_cache):
+    """Record the metrics of all your assets, for `damn trend`"""
+    command_output = take_snapshot_data(prefix, orchestrator, io_manager, data_warehouse, configs_dir, batch_size, get_cache_mode(refresh, no_cache))
+
+    render(command_output, output)
@@ -0,0 +1,86 @@
+import click
+import datetime
+import time
+
+from .utils.asset_index import complete_asset_keys
+from .utils.helpers import (
+    build_command_output,
+    init_connector,
+    serialize_command_output
+)
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
+from .utils.snapshots import SnapshotStore, get_snapshots_dir
+
+
+def format_timestamp(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp is not None else None
+
+
+def get_change(first, last, name):
+    if first[name] is None or last[name] is None:
+        return None
+    return last[name] - first[name]
+
+
+def asset_trend_data(asset, days=90, orchestrator=None, configs_dir=None, path=None):
+    # Only reads the local snapshots of the orchestrator's deployment, its connector is never initialized
+    if path is None:
+        orchestrator_connector = init_connector('orchestrator', orchestrator, configs_dir)
+        if orchestrator_connector is None:
+            raise click.UsageError("Snapshots are stored per orchestrator profile, and none is configured")
+        path = get_snapshots_dir(orchestrator_connector)
+
+    since = time.time() - days * 24 * 60 * 60 if days else None
+    snapshots = SnapshotStore(path).trend(asset, since)
+
+    if not snapshots:
+        raise click.UsageError(f"No snapshots covering {asset} were recorded over that period, see `damn snapshot`")
+    if not any(snapshot['assets'] for snapshot in snapshots):
+        raise click.UsageError(f"No snapshot holds an asset or a prefix named {asset}")
+
+    data = {
+        'Snapshots': {
+            format_timestamp(snapshot['taken_at']): {
+                'assets': snapshot['assets'],
+                'files': snapshot['files'],
+                'size': snapshot['size'],
+                'row_count': snapshot['row_count'],
+                'bytes': snapshot['bytes'],
+                'last_materialized': format_timestamp(snapshot['materialized_at'])
+            }
+            for snapshot in snapshots
+        },
+        'Change': None
+    }
+
+    if len(snapshots) > 1:
+        first, last = snapshots[0], snapshots[-1]
+        data['Change'] = {
+            'period': str(datetime.timedelta(seconds=last['taken_at'] - first['taken_at'])),
+            'assets': last['assets'] - first['assets'],
+            'files': get_change(first, last, 'files'),
+            'size': get_change(first, last, 'size'),
+            'row_count': get_change(first, last, 'row_count'),
+            'bytes': get_change(first, last, 'bytes')
+        }
+
+    # Package asset trend
+    return build_command_output('trend', data)
+
+
+def asset_trend(asset, days=90, orchestrator=None, configs_dir=None, path=None):
+    # Same as asset_trend_data, serialized to JSON
+    return serialize_command_output(asset_trend_data(asset, days, orchestrator, configs_dir, path))
+
+
+@click.command()
+@click.argument('asset', required=True, shell_complete=complete_asset_keys)
+@click.option('--days', default=90, type=int, help='Number of days of snapshots to report on. 0 for all of them')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider whose snapshots to read')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+def trend(asset, days, orchestrator, output, configs_dir):
+    """Show how an asset, or all assets under a prefix, evolved across snapshots"""
+    command_output = asset_trend_data(asset, days, orchestrator, configs_dir)
+
+    render(command_output, output)
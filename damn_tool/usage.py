@@ -0,0 +1,79 @@
+import click
+import datetime
+
+from .utils.asset_index import complete_asset_keys
+from .utils.daemon import run_command
+from .utils.helpers import (
+    build_command_output,
+    init_connectors,
+    serialize_command_output
+)
+from .utils.renderers import OUTPUT_HELP, OUTPUTS, render
+from .utils.table_index import resolve_asset_tables
+from .utils.usage_store import UsageStore
+
+
+def format_elapsed_time(milliseconds):
+    return str(datetime.timedelta(milliseconds=milliseconds)) if milliseconds is not None else None
+
+
+def get_data_warehouse_data(data_warehouse_connector, asset, days):
+    qualified_name = resolve_asset_tables(data_warehouse_connector, [asset])[asset]
+
+    data = {
+        'table': qualified_name,
+        'period': f"last {days} days",
+    }
+
+    if qualified_name is None:
+        return data
+
+    # Pull the history added since the last report, then aggregate locally
+    store = UsageStore(data_warehouse_connector)
+    try:
+        store.sync()
+        usage = store.report(qualified_name, days)
+    finally:
+        store.close()
+
+    # Only the history synced so far is reported on, see `usage_lookback_days`
+    since, truncated = usage.pop('since'), usage.pop('truncated')
+    if truncated:
+        data['period'] = f"since {since.strftime('%Y-%m-%d %H:%M')} UTC (only {(datetime.datetime.now(datetime.timezone.utc) - since).days} days of history synced)"
+
+    usage['avg_elapsed_time'] = format_elapsed_time(usage.pop('avg_elapsed_ms'))
+    usage['max_elapsed_time'] = format_elapsed_time(usage.pop('max_elapsed_ms'))
+    data.update(usage)
+
+    return data
+
+
+def asset_usage_data(asset, days=30, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None):
+    orchestrator_connector, io_manager_connector, data_warehouse_connector = init_connectors(orchestrator, io_manager, data_warehouse, configs_dir)
+
+    data = {
+        "Data Warehouse Usage": get_data_warehouse_data(data_warehouse_connector, asset, days) if data_warehouse_connector else None
+    }
+
+    # Package asset usage
+    return build_command_output('usage', data)
+
+
+def asset_usage(asset, days=30, orchestrator=None, io_manager=None, data_warehouse=None, configs_dir=None):
+    # Same as asset_usage_data, serialized to JSON
+    return serialize_command_output(asset_usage_data(asset, days, orchestrator, io_manager, data_warehouse, configs_dir))
+
+
+@click.command()
+@click.argument('asset', required=True, shell_complete=complete_asset_keys)
+@click.option('--days', default=30, type=int, help='Number of days of query history to report on')
+@click.option('--orchestrator', default=None, help='Orchestrator service provider to use')
+@click.option('--io_manager', default=None, help='IO manager service provider to use')
+@click.option('--data-warehouse', default=None, help='Data warehouse service provider to use')
+@click.option('--output', default='terminal', type=click.Choice(OUTPUTS), help=OUTPUT_HELP)
+@click.option('--configs-dir', default=None, help='Which directory to look in for the connectors.yml file. If not set, DAMN will look in the `~/.damn/` directory')
+def usage(asset, days, orchestrator, io_manager, data_warehouse, output, configs_dir):
+    """Show query performance and usage metrics for a specific asset"""
+    command_output = run_command(asset_usage_data, asset=asset, days=days, orchestrator=orchestrator, io_manager=io_manager, data_warehouse=data_warehouse, configs_dir=configs_dir)
+
+    render(command_output, output)
@@ -9,6 +9,10 @@ class BaseDataWareouseAdapter(ABC):
     def execute(self, sql):
         pass
 
+    @abstractmethod
+    def get_tables_metadata(self, table_names):
+        pass
+
     @abstractmethod
     def close(self):
         pass
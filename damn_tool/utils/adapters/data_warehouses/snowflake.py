@@ -1,6 +1,28 @@
 # adapter/snowflake.py
+import atexit
 import snowflake.connector
+import threading
+
 from .base import BaseDataWareouseAdapter
+from ... import tracing
+
+# Table attributes returned by get_tables_metadata
+TABLE_METADATA_COLUMNS = [
+    'table_catalog',
+    'table_schema',
+    'table_name',
+    'table_type',
+    'row_count',
+    'bytes',
+    'created',
+    'last_altered',
+    'clustering_key',
+    'retention_time',
+    'comment',
+]
+
+# Number of table names bound in a single lookup query
+TABLE_LOOKUP_CHUNK_SIZE = 1000
 
 class SnowflakeAdapter(BaseDataWareouseAdapter):
     def __init__(self, config):
@@ -11,21 +33,116 @@ class SnowflakeAdapter(BaseDataWareouseAdapter):
             account=self.config['account'],
             warehouse=self.config['warehouse'],
             database=self.config['database'],
-            schema=self.config['schema']
+            schema=self.config['schema'],
+            client_session_keep_alive=True
         )
         self.cur = self.conn.cursor()
 
-    def execute(self, sql):
+        # The session is kept open across calls, and only closed when the process exits
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def execute(self, sql, params=None):
         try:
-            self.cur.execute(sql)
-            result = self.cur.fetchone()
-            return result, self.cur.description
+            with self._lock, tracing.span('snowflake.query', 'sql'):
+                self.cur.execute(sql, params)
+                result = self.cur.fetchone()
+                return result, self.cur.description
         except Exception as e:
             print(f"An error occurred: {e}")
             return None, []
 
+    def fetchall(self, sql, params=None):
+        with self._lock, tracing.span('snowflake.query', 'sql'):
+            self.cur.execute(sql, params)
+            rows = self.cur.fetchall()
+            tracing.add('rows', len(rows))
+            return rows, self.cur.description
+
+    def fetch_batches(self, sql, params=None, batch_size=10000):
+        # Stream large results as (columns, rows) batches. Arrow batches are used when pyarrow is
+        # installed (`pip install "snowflake-connector-python[pandas]"`), row batches otherwise.
+        cur = self.conn.cursor()
+
+        try:
+            cur.execute(sql, params)
+            columns = [column[0].lower() for column in cur.description]
+
+            try:
+                batches = cur.fetch_arrow_batches()
+            except snowflake.connector.errors.Error:
+                batches = None
+
+            if batches is not None:
+                for batch in batches:
+                    yield columns, list(zip(*[column.to_pylist() for column in batch.columns]))
+            else:
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield columns, rows
+        finally:
+            cur.close()
+
+    def list_tables(self, database, altered_after=None):
+        # Every table of a database, or only those created or altered after a given time
+        sql = f"""select
+            table_catalog,
+            table_schema,
+            table_name,
+            last_altered
+
+        from {database}.information_schema.tables
+        where table_schema != 'INFORMATION_SCHEMA'
+        """
+        params = []
+
+        if altered_after is not None:
+            sql += "and last_altered > %s::timestamp_ltz"
+            params.append(altered_after)
+
+        rows, description = self.fetchall(sql, params)
+        columns = [column[0].lower() for column in description]
+
+        return [dict(zip(columns, row)) for row in rows]
+
+    def get_tables_metadata(self, qualified_names):
+        # Look up `database.schema.table` names, with one query per schema so each one only
+        # scans that schema's metadata. Results are indexed by lower-cased qualified name.
+        schemas = {}
+        for qualified_name in qualified_names:
+            database, schema, table = qualified_name.split('.')
+            schemas.setdefault((database, schema), set()).add(table)
+
+        tables = {}
+        for (database, schema), table_names in schemas.items():
+            table_names = sorted(table_names)
+
+            for start in range(0, len(table_names), TABLE_LOOKUP_CHUNK_SIZE):
+                chunk = table_names[start:start + TABLE_LOOKUP_CHUNK_SIZE]
+
+                sql = f"""select
+                    {', '.join(TABLE_METADATA_COLUMNS)}
+
+                from {database}.information_schema.tables
+                where table_schema = %s
+                and table_name in ({', '.join(['%s'] * len(chunk))})
+                """
+
+                rows, description = self.fetchall(sql, [schema] + chunk)
+                columns = [column[0].lower() for column in description]
+
+                for row in rows:
+                    table = dict(zip(columns, row))
+                    tables[f"{table['table_catalog']}.{table['table_schema']}.{table['table_name']}".lower()] = table
+
+        return tables
+
     def close(self):
         if self.cur:
             self.cur.close()
+            self.cur = None
         if self.conn:
             self.conn.close()
+            self.conn = None
@@ -1,62 +1,154 @@
 import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+import os
 
 from .base import BaseIOManagerAdapter
+from ... import tracing
 
 
 class AWSAdapter(BaseIOManagerAdapter):
     def __init__(self, config):
         self.config = config
 
-        boto3.setup_default_session(aws_access_key_id=config['credentials']['access_key_id'], 
+        # Listing settings, configurable per profile in connectors.yml
+        self.max_workers = config.get('max_workers', 8)
+        self.page_size = config.get('page_size', 1000)
+        self.shards = config.get('shards', 16)
+
+        boto3.setup_default_session(aws_access_key_id=config['credentials']['access_key_id'],
                                     aws_secret_access_key=config['credentials']['secret_access_key'])
-        
-        self.s3 = boto3.client('s3')
-        
-    
-    def get_folder_stats(self, bucket, prefix):
-        latest_modification = None
-        total_size = 0
-        num_files = 0
-        
+
+        # Enough pooled connections for every listing thread, of every asset listed at once
+        self.s3 = boto3.client('s3', config=Config(max_pool_connections=max(10, self.max_workers * config.get('concurrency', 8))))
+
+
+    def get_item_key(self, prefix, key):
+        # Same grouping as a `Delimiter='/'` listing: keys directly under the prefix are files,
+        # anything deeper belongs to its top-level folder
+        separator = key.find('/', len(prefix))
+        return key if separator == -1 else key[:separator + 1]
+
+
+    def get_stop_key(self, item_key):
+        # First key sorting after everything that belongs to the item
+        if item_key.endswith('/'):
+            return item_key[:-1] + chr(ord('/') + 1)
+        return item_key + '\x00'
+
+
+    def measure_page(self, page):
+        return {'objects': len(page.get('Contents', []))}
+
+
+    def iter_contents(self, bucket, prefix, start_after=None, end=None, stop_key=None):
+        # Keys in (start_after, end], end being unbounded when None
+        params = {'Bucket': bucket, 'Prefix': prefix, 'PaginationConfig': {'PageSize': self.page_size}}
+        if start_after is not None:
+            params['StartAfter'] = start_after
+
         paginator = self.s3.get_paginator('list_objects_v2')
-        
-        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+
+        for page in tracing.traced_iter(paginator.paginate(**params), 's3.list_objects_v2', 'http', measure=self.measure_page):
             for content in page.get('Contents', []):
-                if latest_modification is None or content["LastModified"] > latest_modification:
-                    latest_modification = content["LastModified"]
-                
-                total_size += content.get("Size", 0)
-                num_files += 1
+                if (end is not None and content['Key'] > end) or (stop_key is not None and content['Key'] >= stop_key):
+                    return
+                yield content
+
+
+    def aggregate_contents(self, prefix, contents, items=None):
+        # Stream objects into running per-item aggregates. Keys of an item are contiguous in
+        # S3's lexicographic listing, so only one aggregate is being updated at a time.
+        aggregates = []
+        current = None
+
+        for content in contents:
+            item_key = self.get_item_key(prefix, content['Key'])
+            if items is not None and item_key not in items:
+                continue
+
+            if current is None or current['key'] != item_key:
+                current = {
+                    'object_type': 'folder' if item_key.endswith('/') else 'file',
+                    'key': item_key,
+                    'num_files': 0,
+                    'file_size': 0,
+                    'last_modified_ts': None
+                }
+                aggregates.append(current)
+
+            current['num_files'] += 1
+            current['file_size'] += content.get("Size", 0)
+            if current['last_modified_ts'] is None or content["LastModified"] > current['last_modified_ts']:
+                current['last_modified_ts'] = content["LastModified"]
 
-        return latest_modification, total_size, num_files
+        return aggregates
+
+
+    def merge_aggregates(self, aggregates, shard_aggregates):
+        # An item can straddle two shards, in which case its aggregates are combined
+        if aggregates and shard_aggregates and aggregates[-1]['key'] == shard_aggregates[0]['key']:
+            last, first = aggregates[-1], shard_aggregates.pop(0)
+            last['num_files'] += first['num_files']
+            last['file_size'] += first['file_size']
+            last['last_modified_ts'] = max(last['last_modified_ts'], first['last_modified_ts'])
+
+        aggregates += shard_aggregates
+
+
+    def get_shard_boundaries(self, prefix, keys):
+        # Split the keys following the first page into ranges, using the successors of the last
+        # listed key at each position where the first page's keys vary (e.g. the day, then the
+        # month, then the year of date partitions). Only characters seen in those keys are used.
+        last_key = keys[-1]
+        charset = sorted(set(''.join(key[len(prefix):] for key in keys)))
+        varying_position = min(len(os.path.commonprefix([keys[0], last_key])), len(last_key) - 1)
+
+        boundaries = set()
+        for position in range(varying_position, len(prefix) - 1, -1):
+            for char in charset:
+                if char > last_key[position]:
+                    boundaries.add(last_key[:position] + char)
+
+        return sorted(boundaries)[:self.shards]
+
+
+    def summarize_items(self, bucket, prefix, items=None):
+        # Single recursive listing of the prefix, aggregated per file and top-level folder.
+        # When `items` is given, only those are aggregated and the listing stops once past them.
+        # The listing also starts just before the first of them, e.g. the latest partitions of a folder.
+        items = set(items) if items else None
+        stop_key = max(self.get_stop_key(item_key) for item_key in items) if items else None
+        params = {'Bucket': bucket, 'Prefix': prefix, 'MaxKeys': self.page_size}
+        if items and len(min(items)) > len(prefix) + 1:
+            # Any key of the first item sorts after this strict prefix of it
+            params['StartAfter'] = min(items)[:-1]
+
+        with tracing.span('s3.list_objects_v2', 'http'):
+            page = self.s3.list_objects_v2(**params)
+            tracing.add('objects', len(page.get('Contents', [])))
+        contents = page.get('Contents', [])
+        aggregates = self.aggregate_contents(prefix, (content for content in contents if stop_key is None or content['Key'] < stop_key), items)
+
+        if page.get('IsTruncated') and contents and (stop_key is None or contents[-1]['Key'] < stop_key):
+            # List the remaining key ranges concurrently
+            keys = [content['Key'] for content in contents]
+            boundaries = [boundary for boundary in self.get_shard_boundaries(prefix, keys) if stop_key is None or boundary < stop_key]
+            ranges = list(zip([keys[-1]] + boundaries, boundaries + [None]))
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                shards = executor.map(
+                    lambda key_range: self.aggregate_contents(prefix, self.iter_contents(bucket, prefix, *key_range, stop_key), items),
+                    ranges
+                )
+
+                for shard_aggregates in shards:
+                    self.merge_aggregates(aggregates, shard_aggregates)
+
+        aggregates.sort(key=lambda x: x['last_modified_ts'], reverse=True)
+
+        return aggregates
 
 
     def list_objects_and_folders(self, bucket, prefix):
-        items = []
-        
-        paginator = self.s3.get_paginator('list_objects_v2')
-        
-        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
-            for content in page.get('Contents', []):
-                items.append({
-                    'object_type': 'file',
-                    'key': content['Key'],
-                    'num_files': 1,
-                    'file_size': content.get("Size", 0),
-                    'last_modified_ts': content['LastModified']
-                })
-            
-            for common_prefix in page.get('CommonPrefixes', []):
-                folder_name = common_prefix["Prefix"]
-                last_modified, total_size, num_files = self.get_folder_stats(bucket, folder_name)
-                items.append({
-                    'object_type': 'folder',
-                    'key': folder_name,
-                    'num_files': num_files,
-                    'file_size': total_size,
-                    'last_modified_ts': last_modified
-                })
-        
-        items.sort(key=lambda x: x['last_modified_ts'], reverse=True)
-        
-        return items
\ No newline at end of file
+        return self.summarize_items(bucket, prefix)
@@ -6,5 +6,9 @@ class BaseOrchestratorAdapter(ABC):
         pass
 
     @abstractmethod
-    def execute(self, sql):
+    def execute(self, query, variables=None):
+        pass
+
+    @abstractmethod
+    def execute_batch(self, operation_name, selection, assets, chunk_size=None, shared_variables=None):
         pass
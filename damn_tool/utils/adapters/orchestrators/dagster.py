@@ -1,6 +1,40 @@
+from functools import lru_cache
+import random
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
 
 from .base import BaseOrchestratorAdapter
+from ... import tracing
+
+# Responses worth retrying, with backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# One pooled, keep-alive session per endpoint, shared by every adapter of the process
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(endpoint, pool_size):
+    with _sessions_lock:
+        if endpoint not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[endpoint] = session
+        return _sessions[endpoint]
+
+
+@lru_cache(maxsize=64)
+def build_batch_document(operation_name, selection, size, shared_definitions=()):
+    # Batched documents only depend on the number of assets, so they're built once per size.
+    # `shared_definitions` declares the variables used by the selection itself, e.g. `$after: String`.
+    definitions = ", ".join([f"$k{i}: AssetKeyInput!" for i in range(size)] + list(shared_definitions))
+    fields = "\n".join(f"a{i}: assetOrError(assetKey: $k{i}) {{ {selection} }}" for i in range(size))
+    return f"query {operation_name}({definitions}) {{\n{fields}\n}}"
+
 
 class DagsterAdapter(BaseOrchestratorAdapter):
     def __init__(self, config):
@@ -8,17 +42,91 @@ class DagsterAdapter(BaseOrchestratorAdapter):
         self.endpoint = config['endpoint']
         self.headers = {
             "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate",
             "Dagster-Cloud-Api-Token": config['api_token'],
         }
 
+        # Number of assets combined into a single batched query
+        self.batch_size = config.get('batch_size', 50)
+
+        # Transport settings: (connect, read) timeouts in seconds, and retries with jittered exponential backoff
+        self.timeout = (config.get('connect_timeout', 10), config.get('timeout', 60))
+        self.max_retries = config.get('max_retries', 4)
+        self.backoff = config.get('backoff', 0.5)
+        self.max_backoff = config.get('max_backoff', 30)
+
+        self.session = get_session(self.endpoint, config.get('pool_size', 10))
+
+
+    def get_retry_delay(self, attempt, retry_after=None):
+        # Honor the server's Retry-After when it gives one, otherwise use "full jitter" backoff
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+    def execute(self, query, variables=None):
+        payload = {"query": query}
+        if variables:
+            payload["variables"] = variables
+
+        for attempt in range(self.max_retries + 1):
+            with tracing.span('dagster.post', 'http'):
+                try:
+                    response = self.session.post(
+                        self.endpoint, # type: ignore
+                        headers=self.headers, # type: ignore
+                        json=payload,
+                        timeout=self.timeout
+                    )
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                    tracing.add('retries')
+                    time.sleep(self.get_retry_delay(attempt))
+                    continue
+
+                tracing.add('bytes', len(response.content))
+
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    tracing.add('retries')
+                    time.sleep(self.get_retry_delay(attempt, response.headers.get('Retry-After')))
+                    continue
+
+                response.raise_for_status()
+
+                return response.json()
+
+
+    def execute_batch(self, operation_name, selection, assets, chunk_size=None, shared_variables=None):
+        # Combine one aliased `assetOrError` field per asset into as few requests as possible.
+        # `shared_variables` maps the selection's variables to their (type, value).
+        chunk_size = chunk_size or self.batch_size
+        shared_variables = shared_variables or {}
+        shared_definitions = tuple(f"${name}: {variable_type}" for name, (variable_type, _) in shared_variables.items())
+        results = {}
+
+        for start in range(0, len(assets), chunk_size):
+            chunk = assets[start:start + chunk_size]
+
+            query = build_batch_document(operation_name, selection, len(chunk), shared_definitions)
+            variables = {f"k{i}": {"path": asset.split('/')} for i, asset in enumerate(chunk)}
+            variables.update({name: value for name, (_, value) in shared_variables.items()})
+
+            result = self.execute(query, variables)
+            data = result.get("data")
+
+            # Without data the whole request failed, e.g. an invalid query or token: raised so every
+            # asset of the chunk reports the error, rather than being silently missing
+            if data is None:
+                errors = result.get("errors") or [{"message": "no data in response"}]
+                raise RuntimeError(f"Dagster {operation_name} query failed: " + "; ".join(str(error.get("message", error)) for error in errors))
+
+            # Split the aliased fields back into per-asset results
+            for i, asset in enumerate(chunk):
+                results[asset] = data.get(f"a{i}")
 
-    def execute(self, query):
-        response = requests.post(
-            self.endpoint, # type: ignore
-            headers=self.headers, # type: ignore
-            json={"query": query}
-        )
-        
-        response.raise_for_status()
-        
-        return response.json()
+        return results
@@ -0,0 +1,74 @@
+from importlib import import_module
+
+# Built-in adapters, by connector and service provider. They are referenced as
+# `module:class` paths so their (heavy) client libraries are only imported when selected.
+ADAPTERS = {
+    'orchestrator': {
+        'dagster': 'damn_tool.utils.adapters.orchestrators.dagster:DagsterAdapter',
+    },
+    'io-manager': {
+        'aws': 'damn_tool.utils.adapters.io_managers.aws:AWSAdapter',
+    },
+    'data-warehouse': {
+        'snowflake': 'damn_tool.utils.adapters.data_warehouses.snowflake:SnowflakeAdapter',
+    },
+}
+
+# Entry point groups other packages can register their own adapters under
+ENTRY_POINT_GROUPS = {
+    'orchestrator': 'damn_tool.orchestrators',
+    'io-manager': 'damn_tool.io_managers',
+    'data-warehouse': 'damn_tool.data_warehouses',
+}
+
+
+def register_adapter(connector, name, adapter):
+    # `adapter` is either an adapter class or a `module:class` path
+    ADAPTERS[connector][name] = adapter
+
+
+def find_entry_point(connector, name):
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+
+    # Python 3.9 returns a dict of groups
+    if hasattr(eps, 'select'):
+        group = eps.select(group=ENTRY_POINT_GROUPS[connector])
+    else:
+        group = eps.get(ENTRY_POINT_GROUPS[connector], [])
+
+    for entry_point in group:
+        if entry_point.name == name:
+            return entry_point.value
+
+    return None
+
+
+def has_adapter(connector, name):
+    if connector not in ADAPTERS:
+        return False
+
+    if name not in ADAPTERS[connector]:
+        # Only scan installed packages when the adapter isn't a built-in one
+        entry_point = find_entry_point(connector, name)
+        if entry_point is None:
+            return False
+        ADAPTERS[connector][name] = entry_point
+
+    return True
+
+
+def load_adapter(connector, name):
+    if not has_adapter(connector, name):
+        raise KeyError(f"No {connector} adapter registered for '{name}'")
+
+    adapter = ADAPTERS[connector][name]
+
+    # Import the adapter module on first use
+    if isinstance(adapter, str):
+        module_name, class_name = adapter.split(':')
+        adapter = getattr(import_module(module_name), class_name)
+        ADAPTERS[connector][name] = adapter
+
+    return adapter
@@ -0,0 +1,134 @@
+from collections import deque
+import sys
+
+from ..ls import iter_asset_pages
+
+ASSET_GRAPH_QUERY = """
+query AssetGraphQuery($prefix: [String!], $cursor: String, $limit: Int) {
+  assetsOrError(prefix: $prefix, cursor: $cursor, limit: $limit) {
+    ... on AssetConnection {
+      nodes {
+        key {
+          path
+        }
+        definition {
+          dependencyKeys {
+            path
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class AssetGraph:
+    # Adjacency lists over interned asset keys: each asset is a small integer, and its
+    # upstream/downstream neighbours are tuples of integers
+    def __init__(self, keys, dependencies):
+        self.keys = [sys.intern(key) for key in keys]
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.upstream = [tuple(node_dependencies) for node_dependencies in dependencies]
+
+        downstream = [[] for _ in self.keys]
+        for node, node_dependencies in enumerate(self.upstream):
+            for dependency in node_dependencies:
+                downstream[dependency].append(node)
+        self.downstream = [tuple(dependents) for dependents in downstream]
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        # Build from Dagster asset nodes. Dependencies that aren't assets of the catalog
+        # (e.g. source assets) are still added, as nodes without dependencies.
+        index = {}
+        keys = []
+        dependencies = []
+
+        def intern_key(key):
+            if key not in index:
+                index[key] = len(keys)
+                keys.append(key)
+                dependencies.append([])
+            return index[key]
+
+        for node in nodes:
+            i = intern_key("/".join(node['key']['path']))
+            definition = node.get('definition') or {}
+            dependencies[i] = [intern_key("/".join(dependency['path'])) for dependency in definition.get('dependencyKeys') or []]
+
+        return cls(keys, dependencies)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['keys'], data['dependencies'])
+
+    def to_dict(self):
+        return {'keys': self.keys, 'dependencies': [list(node_dependencies) for node_dependencies in self.upstream]}
+
+    def get_node(self, asset):
+        if asset not in self.index:
+            raise KeyError(f"Asset not found in the lineage graph: {asset}")
+        return self.index[asset]
+
+    def get_neighbours(self, direction):
+        return self.upstream if direction == 'upstream' else self.downstream
+
+    def traverse(self, asset, direction, depth=None):
+        # Breadth first walk, returning each reachable asset with its distance from `asset`
+        neighbours = self.get_neighbours(direction)
+        start = self.get_node(asset)
+        distances = {start: 0}
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            if depth is not None and distances[node] >= depth:
+                continue
+
+            for neighbour in neighbours[node]:
+                if neighbour not in distances:
+                    distances[neighbour] = distances[node] + 1
+                    queue.append(neighbour)
+
+        del distances[start]
+        return {self.keys[node]: distance for node, distance in distances.items()}
+
+    def shortest_path(self, source, target, direction):
+        neighbours = self.get_neighbours(direction)
+        start, end = self.get_node(source), self.get_node(target)
+        parents = {start: None}
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            if node == end:
+                path = []
+                while node is not None:
+                    path.append(self.keys[node])
+                    node = parents[node]
+                return path[::-1]
+
+            for neighbour in neighbours[node]:
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    queue.append(neighbour)
+
+        return None
+
+    def path(self, source, target):
+        # Lineage path between two assets, whichever of them is upstream of the other
+        return self.shortest_path(source, target, 'downstream') or self.shortest_path(source, target, 'upstream')
+
+
+def iter_graph_nodes(orchestrator_connector, page_size=None):
+    # Page through the whole catalog with its dependencies, a single query per page
+    for page in iter_asset_pages(orchestrator_connector, None, page_size, ASSET_GRAPH_QUERY, lambda node: node):
+        yield from page
+
+
+def get_asset_graph(orchestrator_connector, cache, page_size=None):
+    # The compact form of the graph is what gets cached, so it's rebuilt without hitting the orchestrator
+    data = cache.fetch(orchestrator_connector, 'asset-graph', '', lambda: AssetGraph.from_nodes(iter_graph_nodes(orchestrator_connector, page_size)).to_dict())
+
+    return AssetGraph.from_dict(data)
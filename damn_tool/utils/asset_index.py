@@ -0,0 +1,289 @@
+from array import array
+from collections import Counter, defaultdict
+from itertools import accumulate
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+from .helpers import CACHE_DIR, load_config
+
+# Seconds between two refreshes of the index, unless the orchestrator profile sets `asset_index_refresh`
+DEFAULT_REFRESH_INTERVAL = 15 * 60
+
+# A background refresh started this many seconds ago without finishing is assumed to have died
+REFRESH_TIMEOUT = 10 * 60
+
+# Completions beyond this many keys are grouped by their next key section
+COMPLETION_LIMIT = 100
+
+# Fuzzy search results, ranked by the number of trigrams they share with the search
+FUZZY_LIMIT = 20
+
+
+def get_trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def encode_ids(ids):
+    # Sorted key ids, delta encoded and compressed: a few bits per id for common trigrams
+    ids = sorted(ids)
+    return zlib.compress(array('L', [b - a for a, b in zip([0] + ids, ids)]).tobytes())
+
+
+def decode_ids(data):
+    deltas = array('L')
+    deltas.frombytes(zlib.decompress(data))
+    return list(accumulate(deltas))
+
+
+def get_successor(prefix):
+    # First string sorting after every string starting with `prefix`
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class AssetIndex:
+    # Persisted index of the catalog's asset keys, sorted for prefix lookups, with a compressed
+    # posting list of key ids per trigram for substring and fuzzy searches. Each orchestrator
+    # profile has its own catalog.
+    def __init__(self, catalog, config=None, path=None):
+        self.catalog = catalog
+        self.config = config or {}
+        self.path = path or os.path.join(CACHE_DIR, 'assets.sqlite')
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute("pragma synchronous=normal")
+        self.conn.execute("""create table if not exists asset_keys (
+            id integer primary key,
+            catalog text not null,
+            key text not null,
+            unique (catalog, key)
+        )""")
+        self.conn.execute("""create table if not exists trigram_postings (
+            catalog text not null,
+            trigram text not null,
+            ids blob not null,
+            primary key (catalog, trigram)
+        ) without rowid""")
+        self.conn.execute("""create table if not exists refreshes (
+            catalog text primary key,
+            refreshed_at real,
+            started_at real
+        )""")
+
+    def get_refresh(self):
+        return self.conn.execute("select refreshed_at, started_at from refreshes where catalog = ?", (self.catalog,)).fetchone() or (None, None)
+
+    def is_built(self):
+        return self.get_refresh()[0] is not None
+
+    def is_stale(self):
+        refreshed_at, started_at = self.get_refresh()
+        now = time.time()
+
+        if started_at is not None and now - started_at < REFRESH_TIMEOUT:
+            return False
+        return refreshed_at is None or now - refreshed_at > self.config.get('asset_index_refresh', DEFAULT_REFRESH_INTERVAL)
+
+    def mark_refresh_started(self):
+        self.conn.execute(
+            "insert into refreshes (catalog, started_at) values (?, ?) on conflict (catalog) do update set started_at = excluded.started_at",
+            (self.catalog, time.time())
+        )
+
+    def get_postings(self, trigrams):
+        rows = self.conn.execute(
+            f"select trigram, ids from trigram_postings where catalog = ? and trigram in ({', '.join('?' * len(trigrams))})",
+            [self.catalog] + list(trigrams)
+        )
+        return {trigram: decode_ids(ids) for trigram, ids in rows}
+
+    def refresh(self, pages):
+        # Incremental: the catalog is listed again, but only the keys added or removed since the
+        # last refresh are written, along with the posting lists of their trigrams
+        existing = dict(self.conn.execute("select key, id from asset_keys where catalog = ?", (self.catalog,)))
+        seen = set()
+        changes = defaultdict(lambda: ([], set()))
+
+        self.conn.execute("begin")
+        try:
+            for page in pages:
+                for key in page:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if key not in existing:
+                        key_id = self.conn.execute("insert into asset_keys (catalog, key) values (?, ?)", (self.catalog, key)).lastrowid
+                        for trigram in get_trigrams(key):
+                            changes[trigram][0].append(key_id)
+
+            removed = [(key, key_id) for key, key_id in existing.items() if key not in seen]
+            for key, key_id in removed:
+                for trigram in get_trigrams(key):
+                    changes[trigram][1].add(key_id)
+            self.conn.executemany("delete from asset_keys where id = ?", [(key_id,) for _, key_id in removed])
+
+            # Posting lists are rewritten a few hundred trigrams at a time
+            trigrams = list(changes)
+            for i in range(0, len(trigrams), 500):
+                batch = trigrams[i:i + 500]
+                postings = self.get_postings(batch)
+                updated = []
+                for trigram in batch:
+                    added_ids, removed_ids = changes[trigram]
+                    ids = [key_id for key_id in postings.get(trigram, []) if key_id not in removed_ids] + added_ids
+                    updated.append((self.catalog, trigram, encode_ids(ids)))
+                self.conn.executemany("insert or replace into trigram_postings (catalog, trigram, ids) values (?, ?, ?)", updated)
+            self.conn.execute("delete from trigram_postings where catalog = ? and length(ids) = ?", (self.catalog, len(encode_ids([]))))
+
+            self.conn.execute(
+                "insert into refreshes (catalog, refreshed_at, started_at) values (?, ?, null) on conflict (catalog) do update set refreshed_at = excluded.refreshed_at, started_at = null",
+                (self.catalog, time.time())
+            )
+            self.conn.execute("commit")
+        except BaseException:
+            self.conn.execute("rollback")
+            raise
+
+        return {'assets': len(seen), 'added': len(seen) - (len(existing) - len(removed)), 'removed': len(removed)}
+
+    def iter_prefix(self, prefix, limit=None):
+        # Keys starting with `prefix`, in order, straight from the (catalog, key) index
+        if prefix:
+            rows = self.conn.execute(
+                "select key from asset_keys where catalog = ? and key >= ? and key < ? order by key" + (" limit ?" if limit else ""),
+                (self.catalog, prefix, get_successor(prefix)) + ((limit,) if limit else ())
+            )
+        else:
+            rows = self.conn.execute(
+                "select key from asset_keys where catalog = ? order by key" + (" limit ?" if limit else ""),
+                (self.catalog,) + ((limit,) if limit else ())
+            )
+        for key, in rows:
+            yield key
+
+    def complete(self, incomplete):
+        keys = list(self.iter_prefix(incomplete, COMPLETION_LIMIT + 1))
+        if not keys:
+            # Nothing starts with it: keys containing it, for shells matching anywhere in a word
+            return self.search(incomplete, fuzzy=False)[:COMPLETION_LIMIT] if len(incomplete) >= 3 else []
+        if len(keys) <= COMPLETION_LIMIT:
+            return keys
+
+        # Too many keys: complete up to the next `/` instead, skipping from one section to the next
+        sections = []
+        lower = incomplete
+        while len(sections) < COMPLETION_LIMIT:
+            row = self.conn.execute(
+                "select key from asset_keys where catalog = ? and key >= ? and key < ? order by key limit 1",
+                (self.catalog, lower, get_successor(incomplete) if incomplete else '\U0010ffff')
+            ).fetchone()
+            if row is None:
+                break
+
+            separator = row[0].find('/', len(incomplete))
+            section = row[0] if separator == -1 else row[0][:separator + 1]
+            sections.append(section)
+            lower = get_successor(section) if section.endswith('/') else section + '\x00'
+
+        return sections
+
+    def get_keys(self, ids):
+        keys = {}
+        ids = list(ids)
+        for i in range(0, len(ids), 900):
+            batch = ids[i:i + 900]
+            keys.update(self.conn.execute(f"select id, key from asset_keys where id in ({', '.join('?' * len(batch))})", batch))
+        return keys
+
+    def search(self, text, fuzzy=True):
+        # Keys containing `text` (case insensitive). Without any, keys sharing the most trigrams
+        # with it, so typos and missing characters still find something.
+        text = text.lower()
+        trigrams = get_trigrams(text)
+
+        if not trigrams:
+            rows = self.conn.execute("select key from asset_keys where catalog = ? and instr(lower(key), ?) > 0 order by key", (self.catalog, text))
+            return [key for key, in rows]
+
+        postings = self.get_postings(trigrams)
+
+        # Intersect from the rarest trigram, then check the candidates actually contain the text
+        if len(postings) == len(trigrams):
+            ordered = sorted(postings.values(), key=len)
+            candidates = set(ordered[0])
+            for ids in ordered[1:]:
+                candidates.intersection_update(ids)
+                if not candidates:
+                    break
+
+            matches = sorted(key for key in self.get_keys(candidates).values() if text in key.lower())
+            if matches or not fuzzy:
+                return matches
+
+        if not fuzzy:
+            return []
+
+        shared = Counter()
+        for ids in postings.values():
+            shared.update(ids)
+
+        # Every key tied with the last one kept competes on length, shorter keys being closer
+        top = shared.most_common(FUZZY_LIMIT)
+        cutoff = max(top[-1][1] if top else 1, len(trigrams) // 2, 1)
+        best = [key_id for key_id, count in shared.items() if count >= cutoff][:FUZZY_LIMIT * 100]
+        keys = self.get_keys(best)
+        best.sort(key=lambda key_id: (-shared[key_id], len(keys[key_id]), keys[key_id]))
+        return [keys[key_id] for key_id in best[:FUZZY_LIMIT]]
+
+    def close(self):
+        self.conn.close()
+
+
+def open_asset_index(orchestrator=None, configs_dir=None):
+    # Index of the orchestrator profile's catalog, without building the connector. None without a profile.
+    profile, config = load_config('orchestrator', orchestrator, configs_dir)
+    if profile is None:
+        return None
+
+    return AssetIndex(f"{profile}:{config.get('endpoint', '')}", config)
+
+
+def refresh_in_background(index, orchestrator=None, configs_dir=None):
+    # Detached `damn index` process, so the command at hand doesn't wait for the catalog listing
+    if not index.is_stale():
+        return
+
+    # Only needed when refreshing, so left out of the CLI's start up
+    import subprocess
+
+    index.mark_refresh_started()
+    command = [sys.executable, '-m', 'damn_tool', 'index', '--quiet']
+    if orchestrator:
+        command += ['--orchestrator', orchestrator]
+    if configs_dir:
+        command += ['--configs-dir', configs_dir]
+
+    subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def complete_asset_keys(ctx, param, incomplete):
+    # Shell completion of asset arguments, answered from the local index only. A stale index is
+    # refreshed in the background, for the next completions.
+    try:
+        index = open_asset_index(ctx.params.get('orchestrator'), ctx.params.get('configs_dir'))
+        if index is None:
+            return []
+
+        try:
+            refresh_in_background(index, ctx.params.get('orchestrator'), ctx.params.get('configs_dir'))
+            return index.complete(incomplete)
+        finally:
+            index.close()
+    except Exception:
+        # Completion must never print a traceback in the middle of the command line
+        return []
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .helpers import CACHE_DIR, DateTimeEncoder, read_config
+
+# Seconds a cached answer stays fresh, unless the connector profile sets `cache_ttl`
+DEFAULT_TTLS = {
+    'orchestrator': 60,
+    'io-manager': 300,
+    'data-warehouse': 300,
+}
+
+# Seconds an answer stored against a materialization fingerprint stays valid, unless the connector
+# profile sets `fingerprint_ttl`. It only bounds how long changes made outside the orchestrator go unseen.
+DEFAULT_FINGERPRINT_TTL = 7 * 24 * 3600
+
+DEFAULT_MAX_SIZE_MB = 100
+
+# Cache modes: `use` reads and writes, `refresh` skips reads but stores fresh answers, `off` bypasses the cache
+CACHE_MODES = ('use', 'refresh', 'off')
+
+_stores = {}
+
+# Settings telling which service a profile points at. They're part of cache keys, and of the keys of
+# the other stores under `~/.damn/cache`, so profiles named alike in different configs dirs (e.g.
+# `dagster`, `aws`, `snowflake`) don't share answers.
+IDENTITY_SETTINGS = ['type', 'endpoint', 'account', 'database', 'schema', 'bucket_name', 'key_prefix', 'partition_extension', 'table_mapping']
+
+# Identity hash per connector config, computed once
+_identities = {}
+
+
+def get_connector_identity(connector):
+    # Hash of the settings telling which service the connector's profile points at
+    config = connector.config
+    cached = _identities.get(id(config))
+    if cached is None or cached[0] is not config:
+        identity = json.dumps([config.get(setting) for setting in IDENTITY_SETTINGS], sort_keys=True, cls=DateTimeEncoder)
+        cached = _identities[id(config)] = (config, hashlib.sha1(identity.encode()).hexdigest()[:16])
+    return cached[1]
+
+
+class CacheStore:
+    # SQLite file shared by all caches of the process that point at the same path
+    def __init__(self, path, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.path = path
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self._conn = None
+        # Running estimate of the size of the entries, only counted again when it goes over budget
+        self._total_size = None
+
+    @property
+    def conn(self):
+        # Opened on first use, so `off` mode never touches the disk
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute("pragma journal_mode=wal")
+            # Losing the latest answers on a power loss is fine for a cache, and spares a sync per write
+            self._conn.execute("pragma synchronous=normal")
+            self._conn.execute("""create table if not exists entries (
+                key text primary key,
+                value text not null,
+                size integer not null,
+                created_at real not null,
+                accessed_at real not null
+            )""")
+            self._conn.execute("create index if not exists entries_accessed_at on entries (accessed_at)")
+        return self._conn
+
+    def get(self, key, ttl):
+        hit, value = self.get_many({key: ttl}).get(key, (False, None))
+        return hit, value
+
+    def get_many(self, ttls):
+        # {key: (hit, value)} for the keys of `ttls`, each with its own TTL, in a single transaction
+        now = time.time()
+        results = {key: (False, None) for key in ttls}
+        keys = list(ttls)
+
+        with self.lock:
+            self.conn.execute("begin")
+            try:
+                hits = []
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = self.conn.execute(f"select key, value, created_at from entries where key in ({', '.join('?' * len(chunk))})", chunk).fetchall()
+                    for key, value, created_at in rows:
+                        if created_at + ttls[key] >= now:
+                            results[key] = (True, value)
+                            hits.append((now, key))
+
+                self.conn.executemany("update entries set accessed_at = ? where key = ?", hits)
+            finally:
+                self.conn.execute("commit")
+
+        return {key: (hit, json.loads(value) if hit else None) for key, (hit, value) in results.items()}
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, values):
+        # Writes {key: value} in a single transaction
+        now = time.time()
+        rows = []
+        for key, value in values.items():
+            serialized = json.dumps(value, cls=DateTimeEncoder)
+            rows.append((key, serialized, len(serialized), now, now))
+
+        with self.lock:
+            self.conn.execute("begin")
+            try:
+                self.conn.executemany("insert or replace into entries (key, value, size, created_at, accessed_at) values (?, ?, ?, ?, ?)", rows)
+                self.evict(sum(row[2] for row in rows))
+            finally:
+                self.conn.execute("commit")
+
+    def evict(self, written_size=0):
+        # Drop the least recently used entries until the cache fits its size budget. The size is
+        # counted at the first write of the process, then estimated from what it writes: entries it
+        # replaces are counted twice, so the table is counted again before evicting anything.
+        if self._total_size is not None:
+            self._total_size += written_size
+            if self._total_size <= self.max_size:
+                return
+
+        total_size = self.conn.execute("select coalesce(sum(size), 0) from entries").fetchone()[0]
+
+        while total_size > self.max_size:
+            rows = self.conn.execute("select key, size from entries order by accessed_at limit 100").fetchall()
+            if not rows:
+                break
+
+            self.conn.executemany("delete from entries where key = ?", [(key,) for key, _ in rows])
+            total_size -= sum(size for _, size in rows)
+
+        self._total_size = total_size
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class MetadataCache:
+    def __init__(self, store, mode='use'):
+        self.store = store
+        self.mode = mode
+
+    def get(self, key, ttl):
+        if self.mode != 'use':
+            return False, None
+        return self.store.get(key, ttl)
+
+    def set(self, key, value):
+        if self.mode != 'off':
+            self.store.set(key, value)
+
+    def get_many(self, ttls):
+        if self.mode != 'use':
+            return {key: (False, None) for key in ttls}
+        return self.store.get_many(ttls)
+
+    def set_many(self, values):
+        if self.mode != 'off' and values:
+            self.store.set_many(values)
+
+    def make_key(self, connector, command, asset):
+        return json.dumps([connector.connector_type, connector.profile, get_connector_identity(connector), command, asset])
+
+    def get_ttl(self, connector):
+        return connector.config.get('cache_ttl', DEFAULT_TTLS.get(connector.connector_type, 0))
+
+    def fetch(self, connector, command, asset, func):
+        # Answer from the cache when possible, so the connector doesn't even get initialized
+        key = self.make_key(connector, command, asset)
+        hit, value = self.get(key, self.get_ttl(connector))
+
+        if not hit:
+            value = func()
+            self.set(key, value)
+
+        return value
+
+    def fetch_many(self, connector, command, assets, func, fingerprints=None):
+        # Same as fetch, but `func` receives the list of missing assets and returns a dict keyed by asset.
+        # Answers of assets with a fingerprint (e.g. of their latest materialization) are stored against
+        # it, and stay valid for as long as it doesn't change.
+        fingerprints = fingerprints or {}
+        ttl = self.get_ttl(connector)
+        fingerprint_ttl = connector.config.get('fingerprint_ttl', DEFAULT_FINGERPRINT_TTL)
+        keys = {}
+        ttls = {}
+        for asset in assets:
+            fingerprint = fingerprints.get(asset)
+            keys[asset] = self.make_key(connector, command if fingerprint is None else f"{command}@{fingerprint}", asset)
+            ttls[keys[asset]] = ttl if fingerprint is None else fingerprint_ttl
+
+        cached = self.get_many(ttls)
+        results = {}
+        missing = []
+        for asset in assets:
+            hit, value = cached[keys[asset]]
+            if hit:
+                results[asset] = value
+            else:
+                missing.append(asset)
+
+        if missing:
+            fetched = func(missing)
+            for asset in missing:
+                results[asset] = fetched.get(asset)
+            self.set_many({keys[asset]: results[asset] for asset in missing})
+
+        return results
+
+
+def open_cache(configs_dir=None, mode='use'):
+    settings = read_config(configs_dir).get('cache') or {}
+    path = os.path.expanduser(settings.get('path', os.path.join(CACHE_DIR, 'metadata.sqlite')))
+
+    # Share one connection per cache file within the process
+    if path not in _stores:
+        _stores[path] = CacheStore(path, settings.get('max_size_mb', DEFAULT_MAX_SIZE_MB))
+
+    return MetadataCache(_stores[path], mode)
+
+
+def get_cache_mode(refresh, no_cache):
+    if no_cache:
+        return 'off'
+    return 'refresh' if refresh else 'use'
@@ -0,0 +1,109 @@
+import click
+import hashlib
+import json
+import os
+import socket
+
+from . import tracing
+from .helpers import get_config_fingerprint, get_config_path
+
+DAEMON_FILE = os.path.expanduser('~/.damn/daemon.json')
+
+# Seconds a command may take in the daemon before the CLI gives up on it
+REQUEST_TIMEOUT = 600
+
+# Status of a request the daemon refuses to run, e.g. rendered for another environment, so the
+# CLI runs the command itself
+REFUSED_STATUS = 409
+
+
+def write_daemon_info(info):
+    # Readable by the current user only, since it holds the daemon's token
+    os.makedirs(os.path.dirname(DAEMON_FILE), exist_ok=True)
+    fd = os.open(DAEMON_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(info, f)
+
+
+def read_daemon_info():
+    # Only a file check when no daemon was started, so the CLI pays nothing for it
+    # Profiled commands run in-process, where they can be traced
+    if os.environ.get('DAMN_NO_DAEMON') or tracing.is_enabled() or not os.path.exists(DAEMON_FILE):
+        return None
+
+    try:
+        with open(DAEMON_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_daemon_info(pid=None):
+    info = read_daemon_info()
+    if info is not None and (pid is None or info.get('pid') == pid):
+        os.remove(DAEMON_FILE)
+
+
+def request_daemon(path, payload, info=None, timeout=REQUEST_TIMEOUT):
+    # Returns the daemon's answer, or None when no daemon is reachable
+    info = info or read_daemon_info()
+    if info is None:
+        return None
+
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{info['port']}{path}",
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json', 'X-Damn-Token': info['token']},
+        method='POST'
+    )
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        if e.code == REFUSED_STATUS:
+            return None
+
+        # The daemon ran the command, and it failed
+        try:
+            message = json.loads(e.read())['error']
+        except (ValueError, KeyError):
+            message = str(e)
+        raise click.ClickException(message)
+    except (urllib.error.URLError, ConnectionError):
+        # Stale file left by a daemon that is gone
+        return None
+    except (TimeoutError, socket.timeout):
+        # Busy or stuck daemon: the command runs in this process instead
+        return None
+
+
+def get_request_fingerprint(configs_dir):
+    # The config the command would be rendered with: its file, and the environment variables it reads
+    try:
+        fingerprint = get_config_fingerprint(get_config_path(configs_dir))
+    except OSError:
+        return None
+
+    return hashlib.sha256(json.dumps(fingerprint).encode()).hexdigest()
+
+
+def request_command(command, kwargs):
+    # The daemon may run from another directory
+    if kwargs.get('configs_dir'):
+        kwargs = {**kwargs, 'configs_dir': os.path.abspath(kwargs['configs_dir'])}
+
+    # The daemon only runs the command when it would render the same config as this process
+    return request_daemon('/run', {'command': command, 'kwargs': kwargs, 'fingerprint': get_request_fingerprint(kwargs.get('configs_dir'))})
+
+
+def run_command(func, **kwargs):
+    # Hand the command over to `damn serve` when one is running, otherwise run it in this process
+    command_output = request_command(func.__name__, kwargs)
+    if command_output is None:
+        command_output = func(**kwargs)
+
+    return command_output
@@ -1,16 +1,34 @@
 import click
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import datetime
-import io
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+import hashlib
 import json
 import os
-import sys
+import re
 from termcolor import colored
-import yaml
+import threading
+
+from .adapters.registry import has_adapter, load_adapter
+from . import tracing
+from .limits import map_limited
+
+CACHE_DIR = os.path.expanduser('~/.damn/cache')
+
+# Parsed connectors.yml per path, along with the fingerprint it was rendered for
+_config_cache = {}
+
+# Stands for an `env()` value in the config cached on disk, so credentials never get written there
+ENV_MARKER = '@@damn-env:{}@@'
+ENV_MARKER_PATTERN = re.compile(r'@@damn-env:(.+?)@@')
+
+# Quoted values reading the environment, e.g. "{{ env('SNOWFLAKE_PASSWORD') }}"
+QUOTED_ENV_PATTERN = re.compile(r"""("[^"\n]*\{\{\s*env\(\s*'[^']+'\s*\)\s*\}\}[^"\n]*"|'[^'\n]*\{\{\s*env\(\s*"[^"]+"\s*\)\s*\}\}[^'\n]*')""")
+
+# Connectors per profile, reused while their configuration doesn't change (e.g. by `damn serve`)
+_connectors = {}
+_connectors_lock = threading.Lock()
 
-from .adapters.orchestrators.dagster import DagsterAdapter
-from .adapters.io_managers.aws import AWSAdapter
-from .adapters.data_warehouses.snowflake import SnowflakeAdapter
 
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -24,6 +42,10 @@ def format_size(size):
     if size is None:
         return "N/A"
 
+    # Negative sizes are size decreases
+    if size < 0:
+        return "-" + format_size(-size)
+
     # Size must be bytes
     units = ['bytes', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB']
     unit = 0
@@ -36,49 +58,213 @@ def format_size(size):
     return f"{size:.2f} {units[unit]}"
 
 
-def init_connectors(orchestrator, io_manager, data_warehouse, configs_dir):
-    # Initiate orchestrator
-    orchestrator_connector_type, orchestrator_config = load_config('orchestrator', orchestrator, configs_dir)
+def run_concurrently(tasks, max_workers=3):
+    # Run independent connector calls concurrently. A failing connector is reported
+    # and its section left empty, so the other sections are still returned.
+    results = {}
 
-    if orchestrator_connector_type == 'dagster':
-        orchestrator_connector = DagsterAdapter(orchestrator_config)
-    else:
-        orchestrator_connector = None
-    
-    # Initiate IO manager
-    io_manager_connector_type, io_manager_config = load_config('io-manager', io_manager, configs_dir)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(task) for name, task in tasks.items() if task is not None}
 
-    if io_manager_connector_type == 'aws':
-        io_manager_connector = AWSAdapter(io_manager_config)
-    else:
-        io_manager_connector = None
+        for name in tasks:
+            if name not in futures:
+                results[name] = None
+                continue
 
-    # Initiate data warehouse connector
-    data_warehouse_connector_type, data_warehouse_config = load_config('data-warehouse', data_warehouse, configs_dir)
+            try:
+                results[name] = futures[name].result()
+            except Exception as e:
+                click.echo(colored(f"{name} failed: {e}", 'red'), err=True)
+                results[name] = None
+
+    return results
+
+
+def map_assets(func, connector, assets):
+    # func(connector, asset) for each asset, within the connector's concurrency and rate limits
+    return map_limited(connector, partial(func, connector), assets)
+
+
+class LazyConnector:
+    # Stands in for an adapter and only builds it (and authenticates) on first use
+    def __init__(self, connector_type, profile, config, factory):
+        self.connector_type = connector_type
+        self.profile = profile
+        self.config = config
+        self._factory = factory
+        self._adapter = None
+        self._lock = threading.Lock()
+
+    @property
+    def adapter(self):
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    with tracing.span(f"{self.connector_type}.connect", 'connector', profile=self.profile):
+                        self._adapter = self._factory(self.config)
+        return self._adapter
+
+    @property
+    def is_initialized(self):
+        return self._adapter is not None
+
+    def close(self):
+        # Nothing to close if the adapter was never used, or doesn't hold a connection
+        if self._adapter is not None and hasattr(self._adapter, 'close'):
+            self._adapter.close()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.adapter, name)
+
+        # Time every adapter call when profiling
+        if tracing.is_enabled() and callable(attribute):
+            def traced(*args, **kwargs):
+                with tracing.span(f"{self.connector_type}.{name}", 'connector', profile=self.profile):
+                    return attribute(*args, **kwargs)
+            return traced
+
+        return attribute
+
+
+def init_connector(connector, profile, configs_dir):
+    profile, config = load_config(connector, profile, configs_dir)
+
+    # Profiles are named after their service provider, unless they set a `type`
+    adapter_name = config.get('type', profile) if isinstance(config, dict) else profile
+
+    if profile is None or not has_adapter(connector, adapter_name):
+        return None
+
+    # Reuse the connector (and its open sessions) built for the same profile and configuration
+    key = (connector, profile, configs_dir)
+    with _connectors_lock:
+        if key in _connectors and _connectors[key].config == config:
+            return _connectors[key]
+
+        if key in _connectors:
+            _connectors[key].close()
+
+        _connectors[key] = LazyConnector(connector, profile, config, lambda config: load_adapter(connector, adapter_name)(config))
+        return _connectors[key]
+
+
+def init_connectors(orchestrator, io_manager, data_warehouse, configs_dir):
+    orchestrator_connector = init_connector('orchestrator', orchestrator, configs_dir)
+    io_manager_connector = init_connector('io-manager', io_manager, configs_dir)
+    data_warehouse_connector = init_connector('data-warehouse', data_warehouse, configs_dir)
 
-    if data_warehouse_connector_type == 'snowflake':
-        data_warehouse_connector = SnowflakeAdapter(data_warehouse_config)
-    else:
-        data_warehouse_connector = None
-    
     return orchestrator_connector, io_manager_connector, data_warehouse_connector
-    
 
-def load_config(connector, profile, configs_dir):
+
+def get_config_fingerprint(path):
+    # The rendered config depends on the file itself and on the environment variables it reads
+    with open(path) as f:
+        template_source = f.read()
+
+    stat = os.stat(path)
+    env_names = sorted(set(re.findall(r"env\(\s*['\"]([^'\"]+)['\"]", template_source)))
+    env_values = hashlib.sha256(json.dumps([os.getenv(name) for name in env_names]).encode()).hexdigest()
+
+    return [path, stat.st_mtime_ns, stat.st_size, env_values]
+
+
+def render_config(path, getenv=os.getenv):
+    # Only needed when the cached config is stale, so imported here to keep startup fast
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+    import yaml
+
     # Create the Jinja environment and register the os.getenv function
-    if configs_dir is not None:
-        env = Environment(loader=FileSystemLoader(os.path.expanduser(configs_dir)), autoescape=select_autoescape(['yaml']))
-    else:
-        env = Environment(loader=FileSystemLoader(os.path.expanduser('~/.damn')), autoescape=select_autoescape(['yaml']))
-    
-    env.globals['env'] = os.getenv
+    env = Environment(loader=FileSystemLoader(os.path.dirname(path)), autoescape=select_autoescape(['yaml']))
+    env.globals['env'] = getenv
 
     # Render the template
-    template = env.get_template('connectors.yml')
+    template = env.get_template(os.path.basename(path))
     rendered_template = template.render()
 
     # Load the YAML
-    config = yaml.safe_load(rendered_template)
+    return yaml.safe_load(rendered_template)
+
+
+def can_cache_template(path):
+    # Environment values can only be filled in after rendering when they're used as (part of) quoted
+    # values, not when the template computes with them
+    with open(path) as f:
+        template_source = f.read()
+
+    quoted = sum(match.group(0).count('env(') for match in QUOTED_ENV_PATTERN.finditer(template_source))
+    return quoted == template_source.count('env(')
+
+
+def fill_env(value):
+    if isinstance(value, dict):
+        return {key: fill_env(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill_env(item) for item in value]
+    if isinstance(value, str):
+        # Same as Jinja rendering os.getenv's result, "None" included
+        return ENV_MARKER_PATTERN.sub(lambda match: str(os.getenv(match.group(1))), value)
+    return value
+
+
+def get_config_path(configs_dir):
+    return os.path.join(os.path.expanduser(configs_dir if configs_dir is not None else '~/.damn'), 'connectors.yml')
+
+
+def read_config(configs_dir):
+    path = get_config_path(configs_dir)
+    fingerprint = get_config_fingerprint(path)
+
+    # Rendered once per process
+    if path in _config_cache and _config_cache[path][0] == fingerprint:
+        return _config_cache[path][1]
+
+    # Then the template, rendered without its environment values, is reused from disk until the
+    # file changes. The values are filled in from this process' environment, in memory only.
+    path_hash = hashlib.sha1(path.encode()).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"config-template-{path_hash}.json")
+    file_fingerprint = fingerprint[:3]
+    template = None
+    config = None
+
+    with tracing.span('config.load', 'config'):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached['fingerprint'] == file_fingerprint:
+                template = cached['template']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    if template is None:
+        with tracing.span('config.render', 'config'):
+            if can_cache_template(path):
+                template = render_config(path, getenv=ENV_MARKER.format)
+            else:
+                config = render_config(path)
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Rendered configs were cached with their credentials before
+            if os.path.exists(os.path.join(CACHE_DIR, f"config-{path_hash}.json")):
+                os.remove(os.path.join(CACHE_DIR, f"config-{path_hash}.json"))
+            if template is not None:
+                with os.fdopen(os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                    json.dump({'fingerprint': file_fingerprint, 'template': template}, f, cls=DateTimeEncoder)
+            elif os.path.exists(cache_path):
+                os.remove(cache_path)
+        except OSError:
+            pass
+
+    if config is None:
+        config = fill_env(template)
+
+    _config_cache[path] = (fingerprint, config)
+
+    return config
+
+
+def load_config(connector, profile, configs_dir):
+    config = read_config(configs_dir)
 
     try:
         if not profile:
@@ -90,81 +276,85 @@ def load_config(connector, profile, configs_dir):
         return None, None
 
 
-def package_command_output(command, data):
-    packaged_command_output = {}
-    
-    if command == 'ls':
-        ls_items = []
-        for node in data['data']['assetsOrError']['nodes']:
-            asset_key = "/".join(node['key']['path'])
-            ls_items.append(asset_key)
-        
-        packaged_command_output['ls'] = ls_items
-    
-    elif command == 'show':
-        show_info = {
+def format_duration(seconds):
+    if seconds is None:
+        return None
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+def build_command_info(command, data):
+    if command == 'show':
+        return {
             "From orchestrator": data['Orchestrator Attributes'],
             "From data warehouse": data['Data Warehouse Attributes']
         }
-        packaged_command_output = {command: show_info}
-    
+
     elif command == 'metrics':
         if data['IO Manager Metrics'] is not None:
             data['IO Manager Metrics']['size'] = format_size(data['IO Manager Metrics']['size'])
+            for partition in (data['IO Manager Metrics'].get('by_partition') or {}).values():
+                partition['size'] = format_size(partition['size'])
         if data['Data Warehouse Metrics'] is not None:
             data['Data Warehouse Metrics']['bytes'] = format_size(data['Data Warehouse Metrics']['bytes'])
 
-        metrics_info = {
+        info = {
             "From orchestrator": data['Orchestrator Metrics'],
             "From IO manager": data['IO Manager Metrics'],
             "From data warehouse": data['Data Warehouse Metrics']
         }
-        packaged_command_output = {command: metrics_info}
-
-    return json.dumps(packaged_command_output, cls=DateTimeEncoder)
-
-
-def print_packaged_command_output(packaged_display_items, level=-1):
-    # Load the JSON string to a dict if it's a string
-    if isinstance(packaged_display_items, str):
-        packaged_display_items = json.loads(packaged_display_items)
-
-    # Define indent for readability
-    indent = ' ' * max(0, level)
-
-    # Check if the current item is a dictionary
-    if isinstance(packaged_display_items, dict):
-        for key, value in packaged_display_items.items():
-            if isinstance(value, (dict, list)):
-                if level >= 0:  # Avoid printing the top level key
-                    # If the key is a dict and we are at the first level, don't print the dash
-                    dash = "" if level == -1 else "-"
-                    prefix = f"{dash} {key}:" if level > 0 else f"{key}:"
-                    click.echo(colored(f"{indent}{prefix}", 'yellow' if level > 1 else 'magenta').lstrip())
-                print_packaged_command_output(value, level=level + 1)
-            elif level >= 0:  # Avoid printing the top level key-value pairs
-                click.echo(colored(f"{indent}- {key}: ", 'yellow') + colored(f"{value}", 'green'))
-
-    # Check if the current item is a list
-    elif isinstance(packaged_display_items, list):
-        for value in packaged_display_items:
-            if isinstance(value, (dict, list)):
-                print_packaged_command_output(value, level=level + 1)
-            elif level >= 0:  # Avoid printing the top level list items
-                click.echo(colored(f"{indent}- {value}", 'cyan'))
-
-
-def run_and_capture(func, *args, **kwargs):
-    # Create a string buffer and redirect stdout to it
-    buffer = io.StringIO()
-    old_stdout = sys.stdout
-    sys.stdout = buffer
-
-    # Run the function and capture its output
-    try:
-        func(*args, **kwargs)
-    finally:
-        # Ensure the original stdout is restored even if the function raises an exception
-        sys.stdout = old_stdout
 
-    return buffer.getvalue()
\ No newline at end of file
+        # Only there with --history
+        if data.get('Orchestrator History') is not None:
+            info["Orchestrator history"] = {
+                field: format_duration(value) if field.startswith(('duration_', 'interval_')) else value
+                for field, value in data['Orchestrator History'].items()
+            }
+
+        return info
+
+    elif command == 'usage':
+        if data['Data Warehouse Usage'] is not None and 'bytes_scanned' in data['Data Warehouse Usage']:
+            data['Data Warehouse Usage']['bytes_scanned'] = format_size(data['Data Warehouse Usage']['bytes_scanned'])
+
+        return {
+            "From data warehouse": data['Data Warehouse Usage']
+        }
+
+    elif command == 'lineage':
+        if data['Sizes'] is not None:
+            data['Sizes']['size'] = format_size(data['Sizes']['size'])
+            data['Sizes']['bytes'] = format_size(data['Sizes']['bytes'])
+
+        return {section: section_data for section, section_data in data.items() if section_data is not None}
+
+    elif command == 'snapshot':
+        return data
+
+    elif command == 'diff':
+        return {section: section_data for section, section_data in data.items() if section_data is not None}
+
+    elif command == 'trend':
+        for snapshot in data['Snapshots'].values():
+            snapshot['size'] = format_size(snapshot['size'])
+            snapshot['bytes'] = format_size(snapshot['bytes'])
+        if data['Change'] is not None:
+            data['Change']['size'] = format_size(data['Change']['size'])
+            data['Change']['bytes'] = format_size(data['Change']['bytes'])
+
+        return {section: section_data for section, section_data in data.items() if section_data is not None}
+
+
+def build_command_output(command, data, batch=False):
+    if command == 'ls':
+        return {'ls': list(data)}
+
+    elif batch:
+        # Batched commands are keyed by asset
+        return {command: {asset: build_command_info(command, asset_data) for asset, asset_data in data.items()}}
+
+    else:
+        return {command: build_command_info(command, data)}
+
+
+def serialize_command_output(command_output):
+    return json.dumps(command_output, cls=DateTimeEncoder)
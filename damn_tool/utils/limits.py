@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+# Calls run at once against each connector type, unless set with the `concurrency` connector setting
+DEFAULT_CONCURRENCY = {'orchestrator': 2, 'io-manager': 8, 'data-warehouse': 2}
+
+# Rate limiters are shared by every command of a process using the same profile
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    # Allows `rate` calls per second on average, in bursts of up to `burst` calls
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def get_concurrency(connector):
+    return connector.config.get('concurrency', DEFAULT_CONCURRENCY.get(connector.connector_type, 4))
+
+
+def get_rate_limiter(connector):
+    # None unless the connector sets a `rate_limit`, in calls per second
+    rate = connector.config.get('rate_limit')
+    if not rate:
+        return None
+
+    key = (connector.connector_type, connector.profile, rate, connector.config.get('burst'))
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = TokenBucket(rate, connector.config.get('burst'))
+        return _rate_limiters[key]
+
+
+def rate_limited(connector, func):
+    # Same as func, each call first waiting for the connector's rate limit
+    rate_limiter = get_rate_limiter(connector)
+    if rate_limiter is None:
+        return func
+
+    def call(*args, **kwargs):
+        rate_limiter.acquire()
+        return func(*args, **kwargs)
+
+    return call
+
+
+def map_limited(connector, func, assets):
+    # {asset: func(asset)}, with up to the connector's concurrency of calls at once
+    func = rate_limited(connector, func)
+    if len(assets) <= 1:
+        return {asset: func(asset) for asset in assets}
+
+    with ThreadPoolExecutor(max_workers=min(get_concurrency(connector), len(assets))) as executor:
+        return dict(zip(assets, executor.map(func, assets)))
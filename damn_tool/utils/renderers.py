@@ -0,0 +1,108 @@
+import click
+import datetime
+from itertools import islice
+import json
+from termcolor import colored
+
+from . import tracing
+from .helpers import DateTimeEncoder
+
+# Lines are written in chunks, so large outputs neither pay one write per line nor get built as a single string
+CHUNK_SIZE = 1000
+
+OUTPUTS = ('terminal', 'json', 'ndjson', 'markdown', 'copy')
+
+OUTPUT_HELP = 'Destination for command output. Options include `terminal` (default) for standard output, `json` to format output as JSON, `ndjson` for one JSON object per asset, `markdown` for uncolored Markdown, or `copy` to copy the Markdown output to the clipboard.'
+
+
+def write_lines(lines, chunk_size=CHUNK_SIZE):
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+        click.echo('\n'.join(chunk))
+
+
+def copy_lines(lines):
+    import pyperclip
+
+    pyperclip.copy(''.join(f"{line}\n" for line in lines))
+
+
+def format_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_tree_lines(items, color=True, level=-1):
+    # Nested sections become headers, values become `- key: value` lines, and lists become `- item` lines
+    paint = colored if color else lambda text, _: text
+    indent = ' ' * max(0, level)
+
+    if isinstance(items, dict):
+        for key, value in items.items():
+            if isinstance(value, (dict, list)):
+                if level >= 0:  # Avoid printing the top level key
+                    prefix = f"- {key}:" if level > 0 else f"{key}:"
+                    yield paint(f"{indent}{prefix}", 'yellow' if level > 1 else 'magenta')
+                yield from iter_tree_lines(value, color, level + 1)
+            elif level >= 0:  # Avoid printing the top level key-value pairs
+                yield paint(f"{indent}- {key}: ", 'yellow') + paint(f"{format_value(value)}", 'green')
+
+    elif isinstance(items, list):
+        for value in items:
+            if isinstance(value, (dict, list)):
+                yield from iter_tree_lines(value, color, level + 1)
+            elif level >= 0:  # Avoid printing the top level list items
+                yield paint(f"{indent}- {format_value(value)}", 'cyan')
+
+
+def iter_ndjson_lines(command_output, batch=False):
+    # Batched outputs get one line per asset, others a single line
+    if batch:
+        for command, assets in command_output.items():
+            for asset, info in assets.items():
+                yield json.dumps({'asset': asset, **info}, cls=DateTimeEncoder)
+    else:
+        yield json.dumps(command_output, cls=DateTimeEncoder)
+
+
+def render(command_output, output='terminal', batch=False):
+    with tracing.span('render', 'render', output=output):
+        render_output(command_output, output, batch)
+
+
+def render_output(command_output, output='terminal', batch=False):
+    # Write a command's structured output straight to its destination
+    if output == 'json':
+        click.echo(json.dumps(command_output, cls=DateTimeEncoder))
+    elif output == 'ndjson':
+        write_lines(iter_ndjson_lines(command_output, batch))
+    elif output == 'markdown':
+        write_lines(iter_tree_lines(command_output, color=False))
+    elif output == 'copy':
+        copy_lines(iter_tree_lines(command_output, color=False))
+    else:
+        write_lines(iter_tree_lines(command_output))
+
+
+def render_asset_keys(pages, output='terminal'):
+    # Write each page of asset keys as soon as it arrives, instead of building the whole listing first
+    if output == 'json':
+        click.echo('{"ls": [', nl=False)
+        first = True
+        for page in pages:
+            if page:
+                click.echo(('' if first else ', ') + ', '.join(json.dumps(asset) for asset in page), nl=False)
+                first = False
+        click.echo(']}')
+    elif output == 'ndjson':
+        write_lines(json.dumps({'asset': asset}) for page in pages for asset in page)
+    elif output == 'markdown':
+        write_lines(f"- {asset}" for page in pages for asset in page)
+    elif output == 'copy':
+        copy_lines(f"- {asset}" for page in pages for asset in page)
+    else:
+        write_lines(colored(f"- {asset}", 'cyan') for page in pages for asset in page)
@@ -0,0 +1,184 @@
+from array import array
+import json
+import mmap
+import os
+
+from .cache import get_connector_identity
+
+SNAPSHOTS_DIR = os.path.expanduser('~/.damn/snapshots')
+
+# One int64 file per column, one row per asset and snapshot. Missing values are stored as -1.
+COLUMNS = ['asset', 'files', 'size', 'row_count', 'bytes', 'materialized_at']
+
+# One row per snapshot: when it was taken, and the first row holding its assets
+SNAPSHOT_COLUMNS = ['taken_at', 'start']
+
+MISSING = -1
+
+
+def get_snapshots_dir(orchestrator_connector):
+    # Each deployment has its own store, named after its orchestrator profile and identity, so
+    # the snapshots of two deployments never make one series
+    return os.path.join(SNAPSHOTS_DIR, f"{orchestrator_connector.profile}-{get_connector_identity(orchestrator_connector)}")
+
+
+def covers(prefix, asset):
+    # Whether a snapshot taken with `--prefix` holds every asset under `asset`
+    if not prefix:
+        return True
+    prefix_segments = prefix.strip('/').split('/')
+    return asset.strip('/').split('/')[:len(prefix_segments)] == prefix_segments
+
+
+class SnapshotStore:
+    # Append-only columnar store of catalog-wide metrics. Within a snapshot, rows are sorted by
+    # asset key, so an asset or a prefix is a contiguous range of rows found by binary search.
+    def __init__(self, path=None):
+        self.path = path or SNAPSHOTS_DIR
+        os.makedirs(self.path, exist_ok=True)
+
+        self.meta = self.read_meta()
+        self.keys = self.read_keys()
+        self.key_ids = {key: i for i, key in enumerate(self.keys)}
+        self.maps = []
+
+    def get_file(self, name):
+        return os.path.join(self.path, name)
+
+    def read_meta(self):
+        try:
+            with open(self.get_file('meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'snapshots': 0, 'keys': 0, 'prefixes': []}
+
+    def read_keys(self):
+        if not os.path.exists(self.get_file('keys.txt')):
+            return []
+        with open(self.get_file('keys.txt')) as f:
+            return f.read().split('\n')[:self.meta['keys']]
+
+    def write_meta(self):
+        # The meta file is replaced last and atomically: rows past its counts (e.g. from an
+        # interrupted append) are ignored by readers and truncated by the next append
+        temporary_file = self.get_file('meta.json.tmp')
+        with open(temporary_file, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temporary_file, self.get_file('meta.json'))
+
+    def truncate(self, name, rows):
+        file = self.get_file(f"{name}.bin")
+        if os.path.exists(file) and os.path.getsize(file) > rows * 8:
+            os.truncate(file, rows * 8)
+
+    def append_column(self, name, values):
+        with open(self.get_file(f"{name}.bin"), 'ab') as f:
+            array('q', values).tofile(f)
+
+    def get_prefix(self, snapshot):
+        # The `--prefix` a snapshot was taken with, None for the whole catalog
+        prefixes = self.meta.get('prefixes', [])
+        return prefixes[snapshot] if snapshot < len(prefixes) else None
+
+    def append(self, taken_at, records, prefix=None):
+        # `records` maps asset keys to their {files, size, row_count, bytes, materialized_at} values
+        for name in COLUMNS:
+            self.truncate(name, self.meta['rows'])
+        for name in SNAPSHOT_COLUMNS:
+            self.truncate(name, self.meta['snapshots'])
+
+        new_keys = [key for key in sorted(records) if key not in self.key_ids]
+        if new_keys:
+            with open(self.get_file('keys.txt'), 'r+' if os.path.exists(self.get_file('keys.txt')) else 'w') as f:
+                f.truncate(len('\n'.join(self.keys).encode()) if self.keys else 0)
+                f.seek(0, os.SEEK_END)
+                f.write(('\n' if self.keys else '') + '\n'.join(new_keys))
+            for key in new_keys:
+                self.key_ids[key] = len(self.keys)
+                self.keys.append(key)
+
+        assets = sorted(records)
+        self.append_column('asset', [self.key_ids[asset] for asset in assets])
+        for name in COLUMNS[1:]:
+            self.append_column(name, [MISSING if records[asset].get(name) is None else int(records[asset][name]) for asset in assets])
+
+        self.append_column('taken_at', [int(taken_at)])
+        self.append_column('start', [self.meta['rows']])
+
+        prefixes = [self.get_prefix(snapshot) for snapshot in range(self.meta['snapshots'])] + [prefix]
+        self.meta = {'rows': self.meta['rows'] + len(assets), 'snapshots': self.meta['snapshots'] + 1, 'keys': len(self.keys), 'prefixes': prefixes}
+        self.write_meta()
+
+    def open_column(self, name, length):
+        # Memory-mapped, so reading months of snapshots doesn't load the columns in memory
+        if length == 0:
+            return memoryview(array('q'))
+
+        f = open(self.get_file(f"{name}.bin"), 'rb')
+        mapped = mmap.mmap(f.fileno(), length * 8, access=mmap.ACCESS_READ)
+        f.close()
+        self.maps.append(mapped)
+
+        return memoryview(mapped).cast('q')
+
+    def find_range(self, asset_column, start, end, pattern, is_prefix):
+        # Rows of a snapshot whose asset key equals `pattern`, or starts with it for prefixes
+        keys = self.keys
+
+        def lower_bound(low, high, value):
+            while low < high:
+                middle = (low + high) // 2
+                if keys[asset_column[middle]] < value:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        first = lower_bound(start, end, pattern)
+        last = lower_bound(first, end, pattern + '\x00' if not is_prefix else pattern[:-1] + chr(ord(pattern[-1]) + 1))
+
+        return first, last
+
+    def trend(self, asset, since=None):
+        # Aggregates of an asset, or of all assets under a prefix, one per snapshot taken after `since`.
+        # Snapshots taken with a `--prefix` not covering it are skipped, rather than counted as empty.
+        is_prefix = asset not in self.key_ids
+        pattern = asset.rstrip('/') + '/' if is_prefix else asset
+
+        rows, snapshots = self.meta['rows'], self.meta['snapshots']
+        columns = {name: self.open_column(name, rows) for name in COLUMNS}
+        taken_at = self.open_column('taken_at', snapshots)
+        starts = self.open_column('start', snapshots)
+
+        results = []
+
+        try:
+            for snapshot in range(snapshots):
+                if since is not None and taken_at[snapshot] < since:
+                    continue
+                if not covers(self.get_prefix(snapshot), asset):
+                    continue
+
+                start = starts[snapshot]
+                end = starts[snapshot + 1] if snapshot + 1 < snapshots else rows
+                first, last = self.find_range(columns['asset'], start, end, pattern, is_prefix)
+
+                result = {'taken_at': taken_at[snapshot], 'assets': last - first}
+                for name in COLUMNS[1:]:
+                    values = [value for value in columns[name][first:last] if value != MISSING]
+                    if name == 'materialized_at':
+                        result[name] = max(values, default=None)
+                    else:
+                        result[name] = sum(values) if values else None
+                results.append(result)
+        finally:
+            for column in list(columns.values()) + [taken_at, starts]:
+                column.release()
+            self.close()
+
+        return results
+
+    def close(self):
+        for mapped in self.maps:
+            mapped.close()
+        self.maps = []
@@ -0,0 +1,106 @@
+from bisect import insort
+import math
+
+
+class P2Quantile:
+    # Streaming quantile estimate in constant memory, with the P² algorithm (Jain & Chlamtac, 1985):
+    # five markers track the minimum, the maximum, the quantile and the two quantiles halfway to it
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        self.count += 1
+
+        # The first five values are kept as they are
+        if len(self.heights) < 5:
+            insort(self.heights, value)
+            return
+
+        heights, positions = self.heights, self.positions
+
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self.parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self.linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def parabolic(self, i, step):
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def linear(self, i, step):
+        q, n = self.heights, self.positions
+        return q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+
+    @property
+    def value(self):
+        if self.count == 0:
+            return None
+
+        # Exact (nearest rank) until there are enough values for the markers
+        if self.count <= 5:
+            return self.heights[max(0, math.ceil(self.p * self.count) - 1)]
+
+        return self.heights[2]
+
+
+class RunningStats:
+    # Count, mean, minimum and maximum of a stream of values, in constant memory
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.mean = value if self.mean is None else self.mean + (value - self.mean) / self.count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+
+class Distribution:
+    # Running stats along with streaming estimates of a few quantiles
+    def __init__(self, quantiles=(0.5, 0.95)):
+        self.stats = RunningStats()
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, value):
+        self.stats.add(value)
+        for quantile in self.quantiles.values():
+            quantile.add(value)
+
+    def summary(self):
+        return {
+            'count': self.stats.count,
+            'mean': self.stats.mean,
+            **{f"p{round(p * 100)}": quantile.value for p, quantile in self.quantiles.items()},
+            'max': self.stats.max,
+        }
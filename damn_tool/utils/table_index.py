@@ -0,0 +1,157 @@
+from fnmatch import fnmatch
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import get_connector_identity
+from .helpers import CACHE_DIR
+
+# Used when the data warehouse profile doesn't define any `table_mapping` rules:
+# tables are named after the last section of the asset key, in an analytics schema
+DEFAULT_MAPPING_RULES = [{'schema': '*analytics*', 'table': '{name}'}]
+
+# Seconds between incremental refreshes, and between full refreshes (which also drop deleted tables)
+DEFAULT_REFRESH_INTERVAL = 15 * 60
+DEFAULT_FULL_REFRESH_INTERVAL = 24 * 60 * 60
+
+_lock = threading.Lock()
+
+
+class TableIndex:
+    # Persisted map of the warehouse's tables, used to resolve asset keys to fully qualified table names
+    def __init__(self, connector, path=None):
+        self.connector = connector
+        self.profile = connector.profile
+        self.identity = get_connector_identity(connector)
+        self.config = connector.config
+        self.path = path or os.path.join(CACHE_DIR, 'tables.sqlite')
+        self.rules = self.config.get('table_mapping') or DEFAULT_MAPPING_RULES
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+
+        # Indexes from before tables were keyed by the warehouse they come from are rebuilt from scratch
+        if 'identity' not in [column[1] for column in self.conn.execute("pragma table_info(tables)")]:
+            self.conn.execute("drop table if exists tables")
+            self.conn.execute("drop table if exists refreshes")
+
+        # Rows are keyed by the profile and by the warehouse it points at, see `IDENTITY_SETTINGS`
+        self.conn.execute("""create table if not exists tables (
+            profile text not null,
+            identity text not null,
+            database text not null,
+            schema text not null,
+            name text not null,
+            last_altered text,
+            primary key (profile, identity, database, schema, name)
+        )""")
+        self.conn.execute("create index if not exists tables_name on tables (profile, identity, lower(name))")
+        self.conn.execute("""create table if not exists refreshes (
+            profile text not null,
+            identity text not null,
+            watermark text,
+            refreshed_at real not null,
+            fully_refreshed_at real not null,
+            primary key (profile, identity)
+        )""")
+
+    def get_databases(self):
+        databases = {rule['database'] for rule in self.rules if rule.get('database')}
+        databases.add(self.config['database'])
+        return sorted(databases)
+
+    def refresh(self, full=False):
+        # Incremental refreshes only fetch the tables created or altered since the last one
+        refresh = self.conn.execute("select watermark, refreshed_at, fully_refreshed_at from refreshes where profile = ? and identity = ?", (self.profile, self.identity)).fetchone()
+        full = full or refresh is None
+        watermark = None if full else refresh[0]
+
+        rows = []
+        for database in self.get_databases():
+            rows += self.connector.list_tables(database, altered_after=watermark)
+
+        now = time.time()
+        with _lock:
+            self.conn.execute("begin")
+            if full:
+                self.conn.execute("delete from tables where profile = ? and identity = ?", (self.profile, self.identity))
+            self.conn.executemany(
+                "insert or replace into tables (profile, identity, database, schema, name, last_altered) values (?, ?, ?, ?, ?, ?)",
+                [(self.profile, self.identity, row['table_catalog'], row['table_schema'], row['table_name'], str(row['last_altered'])) for row in rows]
+            )
+
+            new_watermark = max([str(row['last_altered']) for row in rows] + ([watermark] if watermark else []), default=None)
+            self.conn.execute(
+                "insert or replace into refreshes (profile, identity, watermark, refreshed_at, fully_refreshed_at) values (?, ?, ?, ?, ?)",
+                (self.profile, self.identity, new_watermark, now, now if full else refresh[2])
+            )
+            self.conn.execute("commit")
+
+    def refresh_if_stale(self):
+        refresh = self.conn.execute("select refreshed_at, fully_refreshed_at from refreshes where profile = ? and identity = ?", (self.profile, self.identity)).fetchone()
+        now = time.time()
+
+        if refresh is None or now - refresh[1] > self.config.get('table_index_full_refresh', DEFAULT_FULL_REFRESH_INTERVAL):
+            self.refresh(full=True)
+        elif now - refresh[0] > self.config.get('table_index_refresh', DEFAULT_REFRESH_INTERVAL):
+            self.refresh()
+
+    def match_rule(self, rule, asset):
+        segments = asset.split('/')
+        prefix = rule.get('prefix')
+        if prefix and asset != prefix and not asset.startswith(prefix.rstrip('/') + '/'):
+            return []
+
+        table_name = rule.get('table', '{name}').format(name=segments[-1], path='_'.join(segments), segments=segments).lower()
+        schema_pattern = rule.get('schema', '*').lower()
+        database = (rule.get('database') or '').lower()
+
+        # Without statistics, SQLite would rather scan the profile's whole primary key than use the name index
+        candidates = self.conn.execute(
+            "select database, schema, name from tables indexed by tables_name where profile = ? and identity = ? and lower(name) = ?",
+            (self.profile, self.identity, table_name)
+        ).fetchall()
+
+        return [
+            candidate for candidate in candidates
+            if fnmatch(candidate[1].lower(), schema_pattern)
+            and (not database or candidate[0].lower() == database)
+        ]
+
+    def resolve(self, asset):
+        segments = asset.lower().split('/')
+
+        # Rules are tried in order, the first one with a matching table wins
+        for rule in self.rules:
+            matches = self.match_rule(rule, asset)
+
+            if matches:
+                # When a table name is found in several schemas, prefer the schema sharing the most sections with the asset key
+                matches.sort(key=lambda match: (-sum(segment in match[1].lower() for segment in segments), match))
+                return '.'.join(matches[0])
+
+        return None
+
+    def resolve_many(self, assets):
+        self.refresh_if_stale()
+        return {asset: self.resolve(asset) for asset in assets}
+
+    def close(self):
+        self.conn.close()
+
+
+def resolve_asset_tables(data_warehouse_connector, assets):
+    index = TableIndex(data_warehouse_connector)
+    try:
+        return index.resolve_many(assets)
+    finally:
+        index.close()
+
+
+def get_asset_tables(data_warehouse_connector, assets):
+    # Resolve assets to their tables, then fetch those tables' attributes in bulk
+    qualified_names = resolve_asset_tables(data_warehouse_connector, assets)
+    tables = data_warehouse_connector.get_tables_metadata([name for name in qualified_names.values() if name])
+
+    return {asset: tables.get(name.lower(), {}) if name else {} for asset, name in qualified_names.items()}
@@ -0,0 +1,142 @@
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+
+# Spans recorded while tracing is enabled (`damn --profile`). When disabled, `span` returns a
+# shared no-op context, so instrumented code pays next to nothing.
+_events = None
+_events_lock = threading.Lock()
+_local = threading.local()
+_start = None
+
+_null_span = nullcontext()
+
+
+def enable():
+    global _events, _start
+    _events = []
+    _start = time.perf_counter()
+
+
+def disable():
+    global _events
+    _events = None
+
+
+def is_enabled():
+    return _events is not None
+
+
+@contextmanager
+def _record_span(name, category, args):
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+
+    event = {'name': name, 'cat': category, 'args': dict(args), 'tid': threading.get_ident()}
+    stack.append(event)
+    start = time.perf_counter()
+
+    try:
+        yield event
+    finally:
+        event['ts'] = start - _start
+        event['dur'] = time.perf_counter() - start
+        stack.pop()
+        with _events_lock:
+            if _events is not None and not event.pop('discard', False):
+                _events.append(event)
+
+
+def span(name, category='damn', **args):
+    if _events is None:
+        return _null_span
+    return _record_span(name, category, args)
+
+
+def add(key, amount=1):
+    # Adds to a counter (bytes, pages, retries...) of the innermost span of the current thread
+    if _events is None:
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        args = stack[-1]['args']
+        args[key] = args.get(key, 0) + amount
+
+
+def traced_iter(iterable, name, category='damn', measure=None, **args):
+    # Records one span per item, e.g. per page of a paginated listing. `measure` returns
+    # the counters of an item, e.g. the number of objects in a page.
+    if _events is None:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    done = object()
+
+    while True:
+        with span(name, category, **args) as event:
+            item = next(iterator, done)
+            if item is done:
+                # Only the items are recorded, not the final check for more
+                event['discard'] = True
+            else:
+                for key, amount in (measure(item) if measure else {}).items():
+                    add(key, amount)
+
+        if item is done:
+            return
+        yield item
+
+
+def summarize():
+    # Totals per span name, slowest first
+    totals = {}
+    for event in _events or []:
+        total = totals.setdefault(event['name'], {'name': event['name'], 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        total['calls'] += 1
+        total['total_ms'] += event['dur'] * 1000
+        total['max_ms'] = max(total['max_ms'], event['dur'] * 1000)
+        for key, value in event['args'].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total[key] = total.get(key, 0) + value
+
+    return sorted(totals.values(), key=lambda total: total['total_ms'], reverse=True)
+
+
+def format_summary(summary):
+    counters = sorted({key for total in summary for key in total} - {'name', 'calls', 'total_ms', 'max_ms'})
+    width = max([len('span')] + [len(total['name']) for total in summary])
+
+    lines = [f"{'span':<{width}} {'calls':>6} {'total':>11} {'max':>11}" + ''.join(f" {counter:>10}" for counter in counters)]
+    for total in summary:
+        lines.append(
+            f"{total['name']:<{width}} {total['calls']:>6} {total['total_ms']:>8.1f} ms {total['max_ms']:>8.1f} ms"
+            + ''.join(f" {total.get(counter, ''):>10}" for counter in counters)
+        )
+
+    return '\n'.join(lines)
+
+
+def write_chrome_trace(path):
+    # Trace Event Format, as loaded by chrome://tracing or https://ui.perfetto.dev
+    pid = os.getpid()
+    trace_events = [
+        {
+            'name': event['name'],
+            'cat': event['cat'],
+            'ph': 'X',
+            'ts': round(event['ts'] * 1e6, 3),
+            'dur': round(event['dur'] * 1e6, 3),
+            'pid': pid,
+            'tid': event['tid'],
+            'args': event['args'],
+        }
+        for event in _events or []
+    ]
+
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,196 @@
+import datetime
+import os
+import sqlite3
+import threading
+
+from .cache import get_connector_identity
+from .helpers import CACHE_DIR
+
+# Days of history pulled the first time a profile is synced
+DEFAULT_LOOKBACK_DAYS = 30
+
+# ACCOUNT_USAGE views lag behind by up to 3 hours, so each sync re-reads that window
+# and relies on the primary key to skip the accesses it already has
+LATENCY_OVERLAP = datetime.timedelta(hours=3)
+
+USAGE_HISTORY_SQL = """select
+    q.query_id,
+    obj.value:"objectName"::string as object_name,
+    q.user_name,
+    q.role_name,
+    q.warehouse_name,
+    q.query_type,
+    q.execution_status,
+    q.start_time,
+    q.total_elapsed_time,
+    q.bytes_scanned,
+    q.rows_produced
+
+from snowflake.account_usage.access_history a
+join snowflake.account_usage.query_history q on q.query_id = a.query_id,
+lateral flatten(input => a.base_objects_accessed) obj
+where a.query_start_time > %s::timestamp_ltz
+and q.start_time > %s::timestamp_ltz
+and obj.value:"objectDomain"::string in ('Table', 'View', 'Materialized view')
+"""
+
+USAGE_COLUMNS = [
+    'query_id',
+    'object_name',
+    'user_name',
+    'role_name',
+    'warehouse_name',
+    'query_type',
+    'execution_status',
+    'start_time',
+    'total_elapsed_time',
+    'bytes_scanned',
+    'rows_produced',
+]
+
+_lock = threading.Lock()
+
+
+def to_utc_string(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc).isoformat()
+    return value
+
+
+class UsageStore:
+    # Local copy of the warehouse's query and access history, pulled incrementally
+    def __init__(self, connector, path=None):
+        self.connector = connector
+        self.profile = connector.profile
+        self.identity = get_connector_identity(connector)
+        self.config = connector.config
+        self.path = path or os.path.join(CACHE_DIR, 'usage.sqlite')
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute("pragma synchronous=normal")
+
+        # History from before it was keyed by the warehouse it comes from is pulled again
+        if 'identity' not in [column[1] for column in self.conn.execute("pragma table_info(syncs)")]:
+            self.conn.execute("drop table if exists accesses")
+            self.conn.execute("drop table if exists syncs")
+
+        # Rows are keyed by the profile and by the warehouse it points at, see `IDENTITY_SETTINGS`
+        self.conn.execute(f"""create table if not exists accesses (
+            profile text not null,
+            identity text not null,
+            {', '.join(f'{column} text' if column not in ('total_elapsed_time', 'bytes_scanned', 'rows_produced') else f'{column} integer' for column in USAGE_COLUMNS)},
+            primary key (profile, identity, query_id, object_name)
+        )""")
+        self.conn.execute("create index if not exists accesses_object on accesses (profile, identity, lower(object_name), start_time)")
+        self.conn.execute("""create table if not exists syncs (
+            profile text not null,
+            identity text not null,
+            watermark text not null,
+            synced_since text,
+            primary key (profile, identity)
+        )""")
+
+    def get_watermark(self):
+        row = self.conn.execute("select watermark from syncs where profile = ? and identity = ?", (self.profile, self.identity)).fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row else None
+
+    def get_synced_since(self):
+        # Start of the history held for the profile, None when unknown
+        row = self.conn.execute("select synced_since from syncs where profile = ? and identity = ?", (self.profile, self.identity)).fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def sync(self):
+        # Only pull the accesses that started after the last sync (minus the latency overlap)
+        watermark = self.get_watermark()
+        synced_since = self.get_synced_since()
+        if watermark is None:
+            since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=self.config.get('usage_lookback_days', DEFAULT_LOOKBACK_DAYS))
+            synced_since = since
+        else:
+            since = watermark - LATENCY_OVERLAP
+
+        new_watermark = watermark
+        since = since.isoformat()
+
+        for columns, rows in self.connector.fetch_batches(USAGE_HISTORY_SQL, [since, since]):
+            positions = [columns.index(column) for column in USAGE_COLUMNS]
+            records = [[self.profile, self.identity] + [to_utc_string(row[position]) for position in positions] for row in rows]
+
+            # One transaction per batch, rather than one per access
+            with _lock:
+                self.conn.execute("begin")
+                try:
+                    self.conn.executemany(
+                        f"insert or ignore into accesses (profile, identity, {', '.join(USAGE_COLUMNS)}) values ({', '.join(['?'] * (len(USAGE_COLUMNS) + 2))})",
+                        records
+                    )
+                    self.conn.execute("commit")
+                except BaseException:
+                    self.conn.execute("rollback")
+                    raise
+
+            batch_watermark = max((datetime.datetime.fromisoformat(record[USAGE_COLUMNS.index('start_time') + 2]) for record in records), default=None)
+            if batch_watermark is not None and (new_watermark is None or batch_watermark > new_watermark):
+                new_watermark = batch_watermark
+
+        if new_watermark is not None:
+            with _lock:
+                self.conn.execute(
+                    "insert or replace into syncs (profile, identity, watermark, synced_since) values (?, ?, ?, ?)",
+                    (self.profile, self.identity, new_watermark.isoformat(), synced_since.isoformat() if synced_since else None)
+                )
+
+    def report(self, qualified_name, days):
+        # Also returns the start of the period actually covered, which is later than asked for
+        # when less history than `days` was synced
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+        synced_since = self.get_synced_since()
+        truncated = synced_since is not None and synced_since > since
+        if truncated:
+            since = synced_since
+
+        filters = "profile = ? and identity = ? and lower(object_name) = ? and start_time >= ?"
+        params = (self.profile, self.identity, qualified_name.lower(), since.isoformat())
+
+        row = self.conn.execute(f"""select
+            count(distinct query_id),
+            count(distinct user_name),
+            max(start_time),
+            sum(case when execution_status != 'SUCCESS' then 1 else 0 end),
+            avg(total_elapsed_time),
+            max(total_elapsed_time),
+            sum(bytes_scanned),
+            sum(rows_produced)
+
+        from accesses
+        where {filters}
+        """, params).fetchone()
+
+        top_users = self.conn.execute(f"""select user_name, count(distinct query_id)
+        from accesses
+        where {filters}
+        group by user_name
+        order by 2 desc, 1
+        limit 5
+        """, params).fetchall()
+
+        return {
+            'since': since,
+            'truncated': truncated,
+            'queries': row[0],
+            'users': row[1],
+            'last_queried': row[2],
+            'failed_queries': row[3] or 0,
+            'avg_elapsed_ms': row[4],
+            'max_elapsed_ms': row[5],
+            'bytes_scanned': row[6],
+            'rows_produced': row[7],
+            'top_users': dict(top_users),
+        }
+
+    def close(self):
+        self.conn.close()